@@ -0,0 +1,181 @@
+# Name: Demolition Derby Benchmark
+# Used with demolition_derby.py
+
+# runs scripted headless matches and writes per-stage timings as JSON
+# python benchmark.py [-o results.json] [--compare old.json] [--scalar] [scenario ...]
+
+import os, sys, time, json, random, platform, argparse
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import pygame
+import gamesetup as gs
+import demolition_derby as dd
+
+class StageTimer:
+    '''represents the time spent in each stage of a frame
+    stages are timed exclusively, so a stage called inside another isn't counted twice'''
+
+    def __init__(self):
+        '''StageTimer() -> StageTimer
+        constructs the timer'''
+        self.times = {}
+        self.calls = {}
+        self.stack = []
+
+    def wrap(self, obj, name, stage):
+        '''StageTimer.wrap(object, str, str) -> None
+        times every call of obj.name as stage'''
+        function = getattr(obj, name)
+        def timed(*args, **kwargs):
+            self.stack.append(0)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                inner = self.stack.pop()
+                if len(self.stack) > 0: self.stack[-1] += elapsed
+                self.times[stage] = self.times.get(stage, 0) + elapsed - inner
+                self.calls[stage] = self.calls.get(stage, 0) + 1
+        setattr(obj, name, timed)
+
+    def get_stages(self, frames):
+        '''StageTimer.get_stages(int) -> dict
+        returns the total and per frame milliseconds and the calls of every stage'''
+        return {stage: {"ms": round(self.times[stage]*1000, 3),
+            "msPerFrame": round(self.times[stage]*1000/max(frames, 1), 4),
+            "calls": self.calls[stage]} for stage in sorted(self.times)}
+
+def add_cars(game, num):
+    '''add_cars(Game, int) -> None
+    adds num cars to every worm in the game'''
+    for worm in game.get_cars():
+        for i in range(num): worm.add_car()
+
+def kill_half(game):
+    '''kill_half(Game) -> None
+    kills every other worm, each one dying a car at a time'''
+    for worm in game.get_cars()[::2]:
+        if worm != game.follow: worm.kill()
+
+# name: (config, cars added to every worm, frame to call the event on, event)
+SCENARIOS = {
+    "default": (dict(), 0, None, None),
+    "bots100": (dict(numWorms=100), 0, None, None),
+    "chains20": (dict(), 19, None, None),
+    "debris5k": (dict(numDebris=5000), 0, None, None),
+    "massdeath": (dict(numWorms=100), 9, 30, kill_half)
+}
+
+def instrument(game, timer):
+    '''instrument(Game, StageTimer) -> None
+    times the stages of the game's frames
+    simulate is the rest of Game.simulate: saving positions and picking up debris'''
+    timer.wrap(game, "run_afters", "afters")
+    timer.wrap(game, "simulate", "simulate")
+    timer.wrap(game, "take_snapshot", "snapshot")
+    timer.wrap(game, "decide_bots", "decide")
+    timer.wrap(game, "move_cars", "move")
+    timer.wrap(game, "get_cars_near", "broadphase")
+    timer.wrap(game, "remove_debris", "remove debris")
+    timer.wrap(game, "replenish", "replenish")
+    timer.wrap(game.get_world(), "forward", "move")
+    timer.wrap(game.get_world(), "follow", "move")
+    timer.wrap(game.get_world(), "hit_walls", "hits")
+    for worm in game.get_cars():
+        timer.wrap(worm, "move", "move")
+        timer.wrap(worm, "follow", "move")
+        timer.wrap(worm, "check_hits", "hits")
+        timer.wrap(worm, "kill", "kill")
+        if isinstance(worm, dd.BotWorm):
+            timer.wrap(worm, "decide", "decide")
+
+def run_scenario(name, frames, seed, scalar=False):
+    '''run_scenario(str, int, int, bool) -> dict
+    plays frames of the scenario and returns its timings
+    frames are driven through Game.update, so cars move one at a time if scalar'''
+    config, extraCars, eventFrame, event = SCENARIOS[name]
+    random.seed(seed)
+    start = time.perf_counter()
+    game = dd.Game(headless=True, config=dd.MatchConfig(**config))
+    game.get_world().set_batched(not scalar)
+    add_cars(game, extraCars)
+    setup = time.perf_counter() - start
+
+    timer = StageTimer()
+    instrument(game, timer)
+    stats = gs.FrameStats(frames)
+    played = 0
+    start = time.perf_counter()
+    while played < frames and not game.is_stopped():
+        if played == eventFrame: event(game)
+        frameStart = time.perf_counter()
+        game.run_afters()
+        game.get_timebase().advance(game.get_timestep())
+        game.update()
+        stats.add(time.perf_counter() - frameStart)
+        played += 1
+    elapsed = time.perf_counter() - start
+
+    return {"frames": played, "seconds": round(elapsed, 4), "setupSeconds": round(setup, 4),
+        "fps": round(played/elapsed, 2) if elapsed > 0 else None,
+        "meanMs": round(stats.get_mean()*1000, 4), "p95Ms": round(stats.get_p95()*1000, 4),
+        "p99Ms": round(stats.get_p99()*1000, 4), "stages": timer.get_stages(played),
+        "worms": len(game.get_cars()), "dead": len(game.dead),
+        "cars": sum(len(worm) for worm in game.get_cars()), "debris": len(game.get_debris())}
+
+def compare(results, old):
+    '''compare(dict, dict) -> None
+    prints how the frames per second changed from old results'''
+    for name in results["scenarios"]:
+        if name not in old.get("scenarios", {}): continue
+        before, after = old["scenarios"][name]["fps"], results["scenarios"][name]["fps"]
+        if before and after:
+            print(f"{name:>10}: {before:9.1f} -> {after:9.1f} fps ({(after/before-1)*100:+.1f}%)", file=sys.stderr)
+
+def main(argv=None):
+    '''main(list) -> dict
+    runs the benchmark from the command line and returns the results'''
+    parser = argparse.ArgumentParser(description="Times scripted headless Demolition Derby matches.")
+    parser.add_argument("scenarios", nargs="*",
+        help="scenarios to run, all of them if none are given: " + ", ".join(SCENARIOS))
+    parser.add_argument("-f", "--frames", type=int, default=600, help="frames per scenario")
+    parser.add_argument("-s", "--seed", type=int, default=1, help="random seed of every scenario")
+    parser.add_argument("--scalar", action="store_true", help="move cars one at a time instead of all at once")
+    parser.add_argument("-o", "--output", help="file to write the JSON to instead of printing it")
+    parser.add_argument("--compare", help="JSON from an earlier run to compare frames per second with")
+    args = parser.parse_args(argv)
+    for name in args.scenarios:
+        if name not in SCENARIOS: parser.error(f"unknown scenario {name}")
+
+    # the game loads its images relative to its own folder,
+    # so the files given are found from where the benchmark was run first
+    output = os.path.abspath(args.output) if args.output != None else None
+    old = os.path.abspath(args.compare) if args.compare != None else None
+    cwd = os.getcwd()
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    results = {"python": platform.python_version(), "pygame": pygame.version.ver,
+        "numpy": dd.numpy.__version__ if dd.numpy != None else None, "platform": platform.platform(),
+        "frames": args.frames, "seed": args.seed, "scalar": args.scalar, "scenarios": {}}
+    try:
+        for name in args.scenarios or SCENARIOS:
+            results["scenarios"][name] = run_scenario(name, args.frames, args.seed, args.scalar)
+            print(f"{name:>10}: {results['scenarios'][name]['fps']} fps", file=sys.stderr)
+    finally:
+        os.chdir(cwd)
+
+    text = json.dumps(results, indent=2)
+    if output == None:
+        print(text)
+    else:
+        with open(output, "w") as file:
+            file.write(text + "\n")
+    if old != None:
+        with open(old) as file:
+            compare(results, json.load(file))
+    return results
+
+if __name__ == "__main__":
+    main()
@@ -3,20 +3,376 @@
 # Version: 1.2
 # Date: 4/14/21
 
-import pygame, random, math
+import pygame, random, math, array, heapq, itertools, collections
 from pygame.locals import *
 import gamesetup as gs
 from os.path import isfile
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+class MatchConfig:
+    '''represents the settings of a match
+    bots farther than lodDistance from the followed worm only decide every lodInterval ticks'''
+
+    # matches with at least this many worms use level of detail unless told otherwise
+    lodWorms = 50
+
+    def __init__(self, numWorms=12, arenaSize=4000, numDebris=250, lodDistance=None, lodInterval=4,
+                 decisionWorkers=0, decisionProcesses=False):
+        '''MatchConfig(int, int, int, float, int, int, bool) -> MatchConfig
+        constructs the settings
+        if lodDistance is None, it is 1200 for large matches and every bot decides every tick in others
+        a lodInterval of 1 turns level of detail off
+        bots decide in decisionWorkers processes, or threads if not decisionProcesses'''
+        self.numWorms = numWorms
+        self.arenaSize = arenaSize
+        self.numDebris = numDebris
+        if lodDistance == None and numWorms >= self.lodWorms: lodDistance = 1200
+        self.lodDistance = lodDistance
+        self.lodInterval = lodInterval
+        self.decisionWorkers = decisionWorkers
+        self.decisionProcesses = decisionProcesses
+
+class CarWorld:
+    '''represents the position, heading and speed of every car in contiguous arrays
+    cars read and write their state in their slot, so every car can be moved at once'''
+
+    def __init__(self, capacity=64):
+        '''CarWorld(int) -> CarWorld
+        constructs the world with room for capacity cars'''
+        self.cars = []
+        self.capacity = capacity
+        self.x = array.array('d', bytes(8*capacity))
+        self.y = array.array('d', bytes(8*capacity))
+        self.head = array.array('d', bytes(8*capacity))
+        self.speed = array.array('d', bytes(8*capacity))
+        self.moving = array.array('B', bytes(capacity))
+        self.views = None
+        self.batched = numpy != None
+
+    def __len__(self):
+        '''len(CarWorld) -> int
+        returns the number of cars in the world'''
+        return len(self.cars)
+
+    def add(self, car):
+        '''CarWorld.add(Car) -> int
+        adds car to the world and returns its slot'''
+        if len(self.cars) == self.capacity:
+            # new arrays are made, since arrays with numpy views can't be resized
+            self.x = self.x + array.array('d', bytes(8*self.capacity))
+            self.y = self.y + array.array('d', bytes(8*self.capacity))
+            self.head = self.head + array.array('d', bytes(8*self.capacity))
+            self.speed = self.speed + array.array('d', bytes(8*self.capacity))
+            self.moving = self.moving + array.array('B', bytes(self.capacity))
+            self.capacity *= 2
+            self.views = None
+        self.cars.append(car)
+        return len(self.cars)-1
+
+    def is_batched(self):
+        '''CarWorld.is_batched() -> bool
+        returns if the cars are moved all at once with numpy'''
+        return self.batched
+
+    def set_batched(self, boolean):
+        '''CarWorld.set_batched(bool) -> None
+        sets if the cars are moved all at once
+        cars are always moved one at a time without numpy'''
+        self.batched = boolean and numpy != None
+
+    def get_views(self):
+        '''CarWorld.get_views() -> (x, y, head, speed, moving)
+        returns numpy arrays sharing memory with the world's arrays'''
+        if self.views == None:
+            self.views = numpy.frombuffer(self.x), numpy.frombuffer(self.y), numpy.frombuffer(self.head), \
+                numpy.frombuffer(self.speed), numpy.frombuffer(self.moving, numpy.uint8)
+        return self.views
+
+    def forward(self):
+        '''CarWorld.forward() -> None
+        moves every car that can move forward by its speed'''
+        x, y, head, speed, moving = self.get_views()
+        n = len(self.cars)
+        distance = speed[:n]*moving[:n]
+        x[:n] += distance*numpy.cos(head[:n])
+        y[:n] -= distance*numpy.sin(head[:n])
+
+    def follow(self, worms):
+        '''CarWorld.follow(list) -> None
+        moves every car in worms behind the car in front of it
+        the worms are done together, one car back at a time'''
+        x, y, head, speed, moving = self.get_views()
+        for i in range(1, max([len(worm) for worm in worms]+[0])):
+            chains = [worm for worm in worms if len(worm) > i]
+            spacing = numpy.array([worm.get_spacing(i) for worm in chains], float)
+            leaders = numpy.array([worm[i-1].slot for worm in chains], int)
+            followers = numpy.array([worm[i].slot for worm in chains], int)
+            alive = numpy.array([worm[i] not in worm.dead for worm in chains], bool)
+
+            # the point spacing*3/7 behind the car in front
+            infront = spacing*(-3/7)
+            tx = numpy.round(x[leaders]) + infront*numpy.cos(head[leaders])
+            ty = numpy.round(y[leaders]) - infront*numpy.sin(head[leaders])
+
+            # turn towards it, then go spacing*4/7 behind it
+            dx, dy = tx - numpy.round(x[followers]), numpy.round(y[followers]) - ty
+            heading = numpy.degrees(numpy.arctan2(dy, dx))
+            heading[heading <= -90] += 360
+            same = (dx == 0) & (dy == 0)
+            heading[same] = numpy.degrees(head[followers][same])
+            radians = numpy.radians(heading)
+            behind = spacing*4/7
+            x[followers[alive]] = (tx - behind*numpy.cos(radians))[alive]
+            y[followers[alive]] = (ty + behind*numpy.sin(radians))[alive]
+            head[followers[alive]] = radians[alive]
+
+    def hit_walls(self, cars, center, radius):
+        '''CarWorld.hit_walls(list, (x,y), float) -> list
+        returns if each car in cars has hit the round wall with center and radius'''
+        x, y, head, speed, moving = self.get_views()
+        slots = numpy.array([car.slot for car in cars], int)
+        heading = head[slots]
+        fx = numpy.round(x[slots]) + Car.frontDistance*numpy.cos(heading)
+        fy = numpy.round(y[slots]) - Car.frontDistance*numpy.sin(heading)
+        hit = numpy.zeros(len(slots), bool)
+        for i in (-1,1):
+            px = fx + Car.frontWidth*numpy.cos(heading+i*math.pi/2)
+            py = fy - Car.frontWidth*numpy.sin(heading+i*math.pi/2)
+            hit |= numpy.hypot(center[0]-px, center[1]-py) > radius-speed[slots]
+        return hit.tolist()
+
+    def get_rects(self, size):
+        '''CarWorld.get_rects((width, length)) -> gs.OrientedRects
+        returns the rects of size around every car, by slot'''
+        x, y, head, speed, moving = self.get_views()
+        n = len(self.cars)
+        return gs.OrientedRects(numpy.stack((numpy.round(x[:n]), numpy.round(y[:n])), 1),
+            size, numpy.degrees(head[:n]))
+
+class DebrisStore:
+    '''represents every piece of debris in packed columns of x, y, value, pad, image and owner
+    pieces are known by handles that don't change until they are removed
+    removing a piece moves the last row into its place'''
+
+    def __init__(self):
+        '''DebrisStore() -> DebrisStore
+        constructs an empty store'''
+        self.x = array.array('d')
+        self.y = array.array('d')
+        self.value = array.array('d')
+        self.pad = array.array('d')
+        self.image = array.array('i')
+        self.owner = array.array('i')
+        self.handles = array.array('q')
+        self.rows = {}
+        self.nextHandle = itertools.count()
+
+        # images are kept once and referred to by their place in the list
+        self.images = []
+        self.imageIDs = {}
+
+    def __len__(self):
+        '''len(DebrisStore) -> int
+        returns the number of pieces of debris'''
+        return len(self.handles)
+
+    def __contains__(self, handle):
+        '''handle in DebrisStore -> bool
+        returns if the piece with handle hasn't been removed'''
+        return handle in self.rows
+
+    def get_image_id(self, image):
+        '''DebrisStore.get_image_id(pygame.Surface) -> int
+        returns the ID of image, keeping it if it is new'''
+        if id(image) not in self.imageIDs:
+            self.imageIDs[id(image)] = len(self.images)
+            self.images.append(image)
+        return self.imageIDs[id(image)]
+
+    def add(self, pos, value, pad, image, owner=-1):
+        '''DebrisStore.add((x,y), float, float, pygame.Surface, int) -> int
+        adds a piece worth value that is pad bigger to pick up
+        and can't be picked up by the car in slot owner, and returns its handle'''
+        handle = next(self.nextHandle)
+        self.rows[handle] = len(self.handles)
+        self.x.append(pos[0])
+        self.y.append(pos[1])
+        self.value.append(value)
+        self.pad.append(pad)
+        self.image.append(self.get_image_id(image))
+        self.owner.append(owner)
+        self.handles.append(handle)
+        return handle
+
+    def remove(self, handle):
+        '''DebrisStore.remove(int) -> bool
+        removes the piece with handle and returns if it was there'''
+        if handle not in self.rows: return False
+        row, last = self.rows.pop(handle), len(self.handles)-1
+        if row != last:
+            for column in (self.x, self.y, self.value, self.pad, self.image, self.owner, self.handles):
+                column[row] = column[last]
+            self.rows[self.handles[row]] = row
+        for column in (self.x, self.y, self.value, self.pad, self.image, self.owner, self.handles):
+            column.pop()
+        return True
+
+    def get_pos(self, handle):
+        '''DebrisStore.get_pos(int) -> (x,y)
+        returns the position of the piece'''
+        row = self.rows[handle]
+        return self.x[row], self.y[row]
+
+    def get_value(self, handle):
+        '''DebrisStore.get_value(int) -> float
+        returns how much xp the piece is worth'''
+        return self.value[self.rows[handle]]
+
+    def get_pad(self, handle):
+        '''DebrisStore.get_pad(int) -> float
+        returns how much bigger the piece is to pick up'''
+        return self.pad[self.rows[handle]]
+
+    def get_image(self, handle):
+        '''DebrisStore.get_image(int) -> pygame.Surface
+        returns the image of the piece'''
+        return self.images[self.image[self.rows[handle]]]
+
+    def get_owner(self, handle):
+        '''DebrisStore.get_owner(int) -> int
+        returns the slot of the car that can't pick up the piece, or -1'''
+        return self.owner[self.rows[handle]]
+
+class DebrisClusters:
+    '''represents debris grouped into square cells with the total value of each cell
+    the cells are kept up to date as debris is added and removed'''
+
+    def __init__(self, cellSize=50, bucketSize=350):
+        '''DebrisClusters(int, int) -> DebrisClusters
+        constructs the clusters with cells of cellSize
+        cells are found near a point through buckets of bucketSize'''
+        self.cellSize = cellSize
+        self.cells = {}
+        self.buckets = gs.SpatialHash(bucketSize)
+
+    def __len__(self):
+        '''len(DebrisClusters) -> int
+        returns the number of cells with debris'''
+        return len(self.cells)
+
+    def cell(self, pos):
+        '''DebrisClusters.cell((x,y)) -> (int, int)
+        returns the cell containing pos'''
+        return int(pos[0]//self.cellSize), int(pos[1]//self.cellSize)
+
+    def center(self, cell):
+        '''DebrisClusters.center((int, int)) -> (x,y)
+        returns the center of cell'''
+        return (cell[0]+0.5)*self.cellSize, (cell[1]+0.5)*self.cellSize
+
+    def add(self, handle, pos, value):
+        '''DebrisClusters.add(int, (x,y), float) -> None
+        adds the debris with handle to its cell'''
+        cell = self.cell(pos)
+        if cell not in self.cells:
+            self.cells[cell] = [0, []]
+            self.buckets.add(cell, self.center(cell))
+        self.cells[cell][0] += value
+        self.cells[cell][1].append(handle)
+
+    def remove(self, handle, pos, value):
+        '''DebrisClusters.remove(int, (x,y), float) -> None
+        removes the debris with handle from its cell'''
+        cell = self.cell(pos)
+        if cell not in self.cells or handle not in self.cells[cell][1]: return
+        self.cells[cell][0] -= value
+        self.cells[cell][1].remove(handle)
+        if len(self.cells[cell][1]) == 0:
+            self.cells.pop(cell)
+            self.buckets.remove(cell, self.center(cell))
+
+    def get_best(self, pos, radius):
+        '''DebrisClusters.get_best((x,y), float) -> [value, list]
+        returns the total value and the debris handles of the best cell within radius of pos
+        returns None if there aren't any'''
+        best = None
+        for cell in self.buckets.query(pos, radius):
+            if gs.distance(self.center(cell), pos) < radius and (best == None or self.cells[cell][0] > best[0]):
+                best = self.cells[cell]
+        return best
+
+class WorldSnapshot:
+    '''represents where the cars of the live worms were at the start of a frame'''
+
+    def __init__(self, game):
+        '''WorldSnapshot(Game) -> WorldSnapshot
+        constructs the snapshot of the game's cars'''
+        self.game = game
+        self.cars = game.get_cars()
+        self.positions = {}
+        self.trails = []
+        for i in range(len(self.cars)):
+            worm = self.cars[i]
+            if worm.is_dead(): continue
+            trail = []
+            for j in range(len(worm)):
+                self.positions[(i, j)] = worm[j].pos()
+                if worm[j].can_move(): trail.append(self.positions[(i, j)])
+            self.trails.append((worm, trail))
+        self.tree = gs.KDTree(list(self.positions.values()), list(self.positions))
+
+    def get_pos(self, i, j):
+        '''WorldSnapshot.get_pos(int, int) -> (x,y)
+        returns where car j of worm i was'''
+        return self.positions[(i, j)]
+
+    def get_cars_near(self, pos, radius):
+        '''WorldSnapshot.get_cars_near((x,y), float) -> list
+        returns (Worm, Car) for the cars that were within radius of pos
+        cars are in the same order as Game.get_cars()'''
+        return [(self.cars[i], self.cars[i][j]) for i, j in sorted(self.tree.query(pos, radius))]
+
+    def get_shared(self):
+        '''WorldSnapshot.get_shared() -> (dict, gs.KDTree, set, (x,y), float)
+        returns the positions by (worm, car), their tree, the worms that are dead now,
+        the center of the arena and how far from it bots turn away
+        these can be sent to other processes'''
+        return self.positions, self.tree, {i for i in range(len(self.cars)) if self.cars[i].is_dead()}, \
+            self.game.get_center(), self.game.get_wall_radius()-15
+
+    def get_trails(self):
+        '''WorldSnapshot.get_trails() -> list
+        returns (Worm, list) with where the moving cars of each live worm were, head first'''
+        return self.trails
 
 class Car(gs.Sprite):
     '''represents a car object'''
 
+    # the front corners are frontDistance ahead of the center and frontWidth to each side
+    # other cars are hit inside a rect of hitSize (width, length) around their center
+    frontDistance = 60
+    frontWidth = 20
+    hitSize = (45, 110)
+
     def __init__(self, game, onsurface, color, eventUse=False):
         '''Car(Game, tuple, bool) -> Car
         constructs the car'''
         surface = game.change_color("car_0.png", (195, 195, 195, 255), color)
-        self.afters = {}
+        # afters are kept in a heap of [odometer due, ID, command] and
+        # after distances also have [distance, point] on the end
+        self.odometer = 0
+        self.afters = []
+        self.afterIDs = {}
+        self.afterCount = itertools.count()
+        self.world = game.get_world()
+        self.slot = self.world.add(self)
+        self.imageHead = None
         gs.Sprite.__init__(self, game, surface, onsurface)
+        self.set_atlas(game.rotations)
+        self.set_image_turning(not game.is_headless())
         self.tilt(-90)
         self.flipLevel = 0
         self.flipFactor = 1
@@ -31,7 +387,6 @@ class Car(gs.Sprite):
         self.brakeBool = True
         self.eventUse = eventUse
         self.slamSpeed = 0.1
-        self.afterDistances = {}
         self.last = None
         self.canMove = True
         self.turnDir = None
@@ -39,9 +394,64 @@ class Car(gs.Sprite):
         self.clock = gs.Clock(game=game)
         self.clock.set_time(1)
         self.clock.start()
-        self.tire = pygame.transform.rotozoom(self.game.change_color("tire.png", (255, 255, 255), color), 0, 0.4)
+        self.tire = self.game.get_tire(color)
         self.turning = None
 
+    @property
+    def position(self):
+        '''Car.position -> (x,y)
+        the position of the car in its world'''
+        return self.world.x[self.slot], self.world.y[self.slot]
+
+    @position.setter
+    def position(self, pos):
+        self.world.x[self.slot], self.world.y[self.slot] = pos
+
+    @property
+    def head(self):
+        '''Car.head -> float
+        the heading of the car in its world in radians'''
+        return self.world.head[self.slot]
+
+    @head.setter
+    def head(self, head):
+        self.world.head[self.slot] = head
+
+    @property
+    def speed(self):
+        '''Car.speed -> float
+        the speed of the car in its world'''
+        return self.world.speed[self.slot]
+
+    @speed.setter
+    def speed(self, speed):
+        self.world.speed[self.slot] = speed
+
+    @property
+    def canMove(self):
+        '''Car.canMove -> bool
+        if the car can move in its world'''
+        return self.world.moving[self.slot] == 1
+
+    @canMove.setter
+    def canMove(self, boolean):
+        self.world.moving[self.slot] = int(boolean)
+
+    def get_rect(self):
+        '''Car.get_rect() -> pygame.Rect
+        returns the rect of the car'''
+        return self.image.get_rect(center=self.pos())
+
+    def heading(self, heading=None):
+        '''Car.heading(heading) -> float
+        returns the heading of the car if heading not given
+        otherwise sets heading. the image is turned when the car is drawn'''
+        if heading == None:
+            return gs.Sprite.heading(self)
+        self.head = math.radians(heading)
+        self.imageHead = None
+        self.pos(self.pos())
+
     def get_tire(self):
         '''Car.get_tire() -> pygame.Surface
         returns the tire surface'''
@@ -135,17 +545,20 @@ class Car(gs.Sprite):
     def can_turn(self, left):
         '''Car.can_turn(bool) -> bool
         returns if car is turning'''
+        if not self.eventUse:
+            return self.turnDir == ("left" if left else "right")
         keys = pygame.key.get_pressed()
-        if left: return (self.eventUse and keys[K_LEFT]) or (not self.eventUse and self.turnDir == "left")
-        return (self.eventUse and keys[K_RIGHT]) or (not self.eventUse and self.turnDir == "right")              
+        if left: return keys[K_LEFT]
+        return keys[K_RIGHT]
 
     def can_change_speed(self, brake):
         '''Car.can_change_speed(bool) -> bool
         returns if the car can change speed'''
+        if not self.eventUse:
+            return self.changeSpeed == ("down" if brake else "up")
         keys = pygame.key.get_pressed()
-        if brake: return (self.eventUse and (keys[K_DOWN])) or \
-            (not self.eventUse and self.changeSpeed == "down")
-        return (self.eventUse and keys[K_UP]) or (not self.eventUse and self.changeSpeed == "up")
+        if brake: return keys[K_DOWN]
+        return keys[K_UP]
 
     def set_change_speed(self, changeSpeed):
         '''Car.set_change_speed(changeSpeed) -> None
@@ -157,11 +570,13 @@ class Car(gs.Sprite):
         setter for turn dir'''
         self.turnDir = turnDir
 
-    def update(self):
-        '''Car.update() -> None
-        updates the car'''
+    def update(self, moved=False):
+        '''Car.update(bool) -> None
+        updates the car
+        if moved, the car's world has already moved it forward'''
         if self.canMove:
-            self.forward(self.speed)
+            if moved: self.count_distance(self.speed)
+            else: self.forward(self.speed)
 
             # the direction the car is travelling
             factor = 0
@@ -173,13 +588,13 @@ class Car(gs.Sprite):
             if self.speed != 0 and self.can_turn(True):
                 if self.turning == None: self.turning = random.randrange(360)
                 else: self.pos(self.in_dir(self.turning, 1, False))
-                if self.last not in self.afters:
+                if self.last not in self.afterIDs:
                     self.last = self.after(5*abs(self.speed)/self.maxSpeed, lambda: self.heading(
                         self.heading()+factor*self.turnSpeed*abs(self.speed)/self.maxSpeed))
             if self.speed != 0 and self.can_turn(False):
                 if self.turning == None: self.turning = random.randrange(360)
                 else: self.pos(self.in_dir(self.turning, 1, False))
-                if self.last not in self.afters:
+                if self.last not in self.afterIDs:
                     self.last = self.after(5*abs(self.speed)/self.maxSpeed, lambda: self.heading(
                         self.heading()-factor*self.turnSpeed*abs(self.speed)/self.maxSpeed))
             if not self.can_turn(True) and not self.can_turn(False):
@@ -193,51 +608,75 @@ class Car(gs.Sprite):
             elif self.can_change_speed(False):
                 self.accelerate()
 
-            # check for hitting walls and cars
-            self.hit_wall()
-
         # check afters
-        for after in self.afters.copy():
-            if self.afters[after][0] < 0:
-                command = self.afters[after][1]
-                self.afters.pop(after)
-                command()
-        for after in self.afterDistances.copy():
-            distance = math.sqrt((self.xcor()-self.afterDistances[after][1][0])**2 + \
-                (self.ycor()-self.afterDistances[after][1][1])**2)
-            if distance > self.afterDistances[after][0]:
-                command = self.afterDistances[after][2]
-                self.afterDistances.pop(after)
-                command()
-
-        gs.Sprite.update(self)
+        while len(self.afters) > 0 and self.afters[0][0] < self.odometer:
+            after = heapq.heappop(self.afters)
+            if after[2] == None: continue
+            if len(after) > 3:
+                # not far enough yet, so check again once the car could have driven there
+                distance = self.distance(after[4])
+                if distance <= after[3]:
+                    after[0] = self.odometer + after[3] - distance
+                    heapq.heappush(self.afters, after)
+                    continue
+            self.afterIDs.pop(after[1])
+            after[2]()
+
+        self.slide()
+
+    def draw(self, alpha=1):
+        '''Car.draw(float) -> None
+        turns the image if the car has turned, then draws it
+        cars off the screen aren't turned'''
+        if self.imageHead != self.head:
+            size = math.hypot(*self.untiltedImg.get_size())
+            x, y = self.draw_pos(alpha)
+            if not isinstance(self.onsurface, gs.Camera) or self.onsurface.is_visible((x-size/2, y-size/2, size, size)):
+                position = self.position
+                gs.Sprite.heading(self, self.heading())
+                self.position = position
+                self.imageHead = self.head
+        gs.Sprite.draw(self, alpha)
                         
     def forward(self, pixels):
         '''Car.forward(pixels) -> None
         moves the car forward pixels'''
-        for after in self.afters.copy():
-            self.afters[after][0] -= abs(pixels)
+        self.count_distance(pixels)
         gs.Sprite.forward(self, pixels)
 
+    def count_distance(self, pixels):
+        '''Car.count_distance(pixels) -> None
+        adds pixels driven to the car's odometer'''
+        self.odometer += abs(pixels)
+
+    def get_odometer(self):
+        '''Car.get_odometer() -> float
+        returns how many pixels the car has driven'''
+        return self.odometer
+
     def faster(self, change=1):
         '''Car.faster(int) -> None
         makes the car move faster'''
         self.speed += change
 
-    def hit_wall(self):
-        '''Car.hit_wall() -> bool
-        returns if the wall is hit'''
-        # get points
+    def get_front(self):
+        '''Car.get_front() -> list
+        returns the front corners of the car'''
         heading = math.radians(self.heading())
-        inFront = self.in_front(60)
+        inFront = self.in_front(self.frontDistance)
         points = []
         for i in (-1,1):
-            points.append((inFront[0] + 20*math.cos(heading+i*math.pi/2), inFront[1] - 20*math.sin(heading+i*math.pi/2)))
+            points.append((inFront[0] + self.frontWidth*math.cos(heading+i*math.pi/2),
+                inFront[1] - self.frontWidth*math.sin(heading+i*math.pi/2)))
+        return points
 
-        # test points
-        for point in points:
-            radius = math.sqrt((2000-point[0])**2 + (2000-point[1])**2)
-            if radius > 1915-self.speed:
+    def hit_wall(self):
+        '''Car.hit_wall() -> bool
+        returns if the wall is hit'''
+        center = self.game.get_center()
+        for point in self.get_front():
+            radius = math.sqrt((center[0]-point[0])**2 + (center[1]-point[1])**2)
+            if radius > self.game.get_wall_radius()-self.speed:
                 return True
 
         return False
@@ -245,16 +684,10 @@ class Car(gs.Sprite):
     def hit_other(self, other):
         '''Car.hit_other(Car) -> bool
         returns if car has hit other'''
-        # get points
-        heading = math.radians(self.heading())
-        inFront = self.in_front(60)
-        points = []
-        for i in (-1,1):
-            points.append((inFront[0] + 20*math.cos(heading+i*math.pi/2), inFront[1] - 20*math.sin(heading+i*math.pi/2)))
-
-        # test points
-        for point in points:
-            if is_in_rect(point, other.pos(), (45, 110), other.heading()):
+        self.game.get_profiler().count("hit_other")
+        for point in self.get_front():
+            self.game.get_profiler().count("is_in_rect")
+            if is_in_rect(point, other.pos(), other.hitSize, other.heading()):
                 return True
 
         return False
@@ -262,28 +695,31 @@ class Car(gs.Sprite):
     def after(self, pixels, command):
         '''Car.after(int, <function or method>) -> ID
         performs command after number of pixels'''
-        ID = random.random()
-        self.afters[ID] = [pixels, command]
+        ID = next(self.afterCount)
+        self.afterIDs[ID] = [self.odometer+pixels, ID, command]
+        heapq.heappush(self.afters, self.afterIDs[ID])
         return ID
 
     def after_cancel(self, ID):
         '''Car.after_cancel(ID) -> None
         cancels after connected to ID'''
-        if ID in self.afters:
-            self.afters.pop(ID)
+        if ID in self.afterIDs:
+            # the after is left in the heap and skipped when it is due
+            self.afterIDs.pop(ID)[2] = None
 
     def after_distance(self, distance, point, command):
         '''Car.after_distance(int, tuple, <function or method>) -> ID
-        performs command after distance from points'''
-        ID = random.random()
-        self.afterDistances[ID] = [distance, point, command]
+        performs command after distance from points
+        the distance is only checked when the car could have driven far enough'''
+        ID = next(self.afterCount)
+        self.afterIDs[ID] = [self.odometer+max(0, distance-self.distance(point)), ID, command, distance, point]
+        heapq.heappush(self.afters, self.afterIDs[ID])
         return ID
 
     def after_distance_cancel(self, ID):
         '''Car.after_distance_cancel(ID) -> None
         cancels an after distance connected to ID'''
-        if ID in self.afterDistances:
-            self.afterDistances.pop(ID)     
+        self.after_cancel(ID)     
 
 class Worm(list):
     '''represents a chain of cars'''
@@ -300,7 +736,7 @@ class Worm(list):
         self.xp = 0
         self.kills = 0
 
-        x,y = 1000, 2000
+        x,y = self.game.get_center()
         for i in range(numCars):
             event = useEvent and i == 0
             new = Car(self.game, self.game.get_field(), color, event)
@@ -309,12 +745,20 @@ class Worm(list):
             y += self.distance
             self.append(new)
 
+        # how close another car must be to be hit within a frame
+        self.reach = math.hypot(Car.frontDistance, Car.frontWidth) + math.hypot(*Car.hitSize)/2 + 2*self[0].get_max() + 10
+
     def head(self):
         '''Worm.head() -> x,y
         returns the head of the car'''
+        return self.head_car().pos()
+
+    def head_car(self):
+        '''Worm.head_car() -> Car
+        returns the car at the head of the worm'''
         if len(self.dead) == 0:
-            return self[0].pos()
-        return self.dead[0].pos()
+            return self[0]
+        return self.dead[0]
 
     def get_kills(self):
         '''Worm.get_kills() -> int
@@ -372,44 +816,61 @@ class Worm(list):
             self[len(self.dead)].set_speed(self[len(self.dead)-1].get_speed())
             self.game.after(200, self.kill)
             
+    def get_spacing(self, i):
+        '''Worm.get_spacing(int) -> float
+        returns how far car i is kept behind the car in front of it'''
+        if self[i-1] in self.dead:
+            return 115
+        elif self[i] in self.stopped:
+            infront = self.stopped[self[i]]
+            if infront >= self.distance:
+                self.stopped.pop(self[i])
+            else:
+                self.stopped[self[i]] += self[0].get_speed()
+            return infront
+        return self.distance
+
     def update(self):
         '''Worm.update() -> None
-        updates the worm'''
-        for car in self: car.update()
+        updates the worm on its own
+        the game updates every worm a phase at a time instead'''
+        self.move()
         if len(self) == len(self.dead): return
+        self.follow()
+        self.check_hits(self[0] not in self.dead and self[0].hit_wall())
 
-        last = self[0]
-        for i in range(len(self)):
-            if i == 0: continue
-
-            if last in self.dead:
-                infront = 115
-            elif self[i] in self.stopped:
-                infront = self.stopped[self[i]]
-                if infront >= self.distance:
-                    self.stopped.pop(self[i])
-                else:
-                    self.stopped[self[i]] += self[0].get_speed()
-            else:
-                infront = self.distance
+    def move(self):
+        '''Worm.move() -> None
+        moves every car of the worm forward and updates it'''
+        for car in self: car.update()
 
+    def follow(self):
+        '''Worm.follow() -> None
+        moves every car behind the car in front of it'''
+        for i in range(1, len(self)):
+            infront = self.get_spacing(i)
             if self[i] not in self.dead: 
-                x, y = last.in_front(infront*(-3/7))
+                x, y = self[i-1].in_front(infront*(-3/7))
                 self[i].heading(self[i].towards((x,y)))
                 radians = math.radians(self[i].heading())
                 self[i].pos((x - (infront*4/7)*math.cos(radians), y + (infront*4/7)*math.sin(radians)))
-                
-            last = self[i]
 
-        # check if dead
-        if self[0] not in self.dead and self[0].hit_wall():
+    def check_hits(self, hitWall, near=None, hits=None):
+        '''Worm.check_hits(bool, list, list) -> None
+        kills the worm if it hit the wall or another car
+        near is (Worm, Car) for the cars near the head and hits is if the head hit each of them
+        they are found here if not given'''
+        if hitWall:
             self.kill()
-        for worm in self.game.get_cars():
-            for car in worm:
-                if car != self[0] and not worm.is_dead() and self[0].hit_other(car):
-                    self.kill()
-                    if worm != self:
-                        worm.add_kill()
+        if near == None:
+            near = self.game.get_cars_near(self[0].pos(), self.reach)
+        for i in range(len(near)):
+            worm, car = near[i]
+            if car != self[0] and not worm.is_dead() and \
+               (self[0].hit_other(car) if hits == None else hits[i]):
+                self.kill()
+                if worm != self:
+                    worm.add_kill()
 
 class BotWorm(Worm):
     '''represents a bot worm
@@ -423,151 +884,168 @@ class BotWorm(Worm):
         self.lastCollected = gs.Clock(game=self.game)
         self.lastCollected.start()
 
-    def collect_debris(self):
-        '''BotWorm.collect_debris() -> bool
-        collects debris'''
-        if self.lastCollected.get_time() < 0.5: return
-        else:
+    def get_view(self, index):
+        '''BotWorm.get_view(int) -> BotView
+        returns what the bot knows to decide, where index is its place in Game.get_cars()'''
+        collecting = self.lastCollected.get_time() >= 0.5
+        target = None
+        if collecting:
+            best = self.game.get_debris_clusters().get_best(self[0].pos(), 700)
+            if best != None: target = best[0], self.game.get_debris().get_pos(best[1][-1])
+        return BotView(index, self[0].pos(), self[0].heading(), self[0].get_speed(),
+            self.lastActions, collecting, target)
+
+    def apply(self, decision):
+        '''BotWorm.apply((dict, lastActions, bool)) -> None
+        applies a decision from decide_bot'''
+        changes, self.lastActions, collected = decision
+        if "turnDir" in changes: self[0].set_turn_dir(changes["turnDir"])
+        if "changeSpeed" in changes: self[0].set_change_speed(changes["changeSpeed"])
+        if collected:
             self.lastCollected.reset()
             self.lastCollected.start()
-            
-        # create collections of points
-        collections = []
-        for debris in self.game.get_debris():
-            distance = self[0].distance(debris[0])
-            if distance < 700:
-                added = False
-                for collection in collections:
-                    if gs.distance(collection[1][0], debris[0]) < 50:
-                        collection.append(debris)
-                        collection[0] += debris[1]
-                        added = True
-                        break
-
-                if not added: collections.append([debris[1], debris])
-
-        # go for best
-        best = None
-        for collection in collections:
-            if best == None or collection[0] > best[0]:
-                best = collection
-                
-        # go to point
-        if len(best) > 0:
-            choice = best[1:][-1]
-            headingDif = self[0].heading() - self[0].towards(choice[0])
-            if headingDif > 10: self[0].set_turn_dir("right")
-            elif headingDif < -10: self[0].set_turn_dir("left")
-            else: self[0].set_turn_dir(None)
-
-            speed = best[0]/7
-            if speed > self[0].get_speed(): self[0].set_change_speed("up")
-            else: self[0].set_change_speed("down")
-        else:
-            self.set_turn_dir(None)
-                
-    def check_wall(self):
-        '''BotWorm.check_wall() -> bool
-        checks for walls'''                    
-        d1, d2 = gs.distance(self[0].in_dir(-45, 300), (2000, 2000)), \
-            gs.distance(self[0].in_dir(45, 300), (2000, 2000))
-        r = 1900
-
-        if d1 >= r:
-            self[0].set_turn_dir("left")
-            self.lastActions = "left"
-        elif d2 >= r:
-            self[0].set_turn_dir("right")
-            self.lastActions = "right"
-        elif isinstance(self.lastActions, str):
-            self.lastActions = 0
-            return False
-        else:
-            return False
 
-        if self[0].get_speed() > 5: self[0].set_change_speed("up")
-        return True
-
-    def move_away_from_wall(self):
-        '''BotWorm.move_away_from_wall() -> bool
-        returns if action is done or not'''
-        if isinstance(self.lastActions, int):
-            if self.lastActions == 15:
-                self.lastActions = None
-                return False
-            else:
-                self[0].set_change_speed("up")
-                self.lastActions += 1
-            return True
-        
-    def check_cars(self):
-        '''BotWorm.check_cars() -> bool
-        checks for other cars'''
-        # get cars around
-        carsAround = []
-        closest = None
-        for worm in self.game.get_cars():
-            for car in worm:
-                if not worm.is_dead() and car != self[0] and self[0].distance(car.pos()) < 400:
-                    headingDif = self[0].towards(car.pos()) - self[0].heading()
-                    if -120 < headingDif < 120:
-                        if closest == None or abs(headingDif) < closest[0]: closest = abs(headingDif), car
-                        carsAround.append(car)
-        
-        if closest == None:
-            return False
-        else:
-            self[0].set_change_speed("up")
-            headingDif = self[0].towards(carsAround[0].pos()) - self[0].heading()
-            if headingDif > 0:
-                self[0].set_turn_dir("right")
-            elif headingDif < 0:
-                self[0].set_turn_dir("left")
-            return True
+    def decide(self):
+        '''BotWorm.decide() -> None
+        chooses what the head car does this frame'''
+        index = self.game.get_cars().index(self)
+        if not self.is_dead() and self.game.is_deciding(index):
+            view = self.get_view(index)
+            self.apply(decide_bot(view, self.game.get_snapshot().get_shared()))
 
     def update(self):
         '''BotCar.update() -> None
         updates the bot car'''
-        if not self.is_dead():
-            hittingWall = self.check_wall()
-            if not hittingWall:
-                hittingCars = self.check_cars()
-                if not hittingCars:
-                    moveAway = self.move_away_from_wall()
-                    if not moveAway:
-                        self.collect_debris()
-
+        self.decide()
         Worm.update(self)   
 
+# what a bot knows when it decides
+# decisions only read a BotView and a shared snapshot, so they can be made in other threads or processes
+BotView = collections.namedtuple("BotView", "index pos heading speed lastActions collecting target")
+
+def decide_bots(views, shared):
+    '''decide_bots(list, tuple) -> list
+    returns decide_bot for each view'''
+    return [decide_bot(view, shared) for view in views]
+
+def decide_bot(view, shared):
+    '''decide_bot(BotView, tuple) -> (dict, lastActions, bool)
+    returns the changes to the head car, the new lastActions and if the bot went for debris
+    shared is from WorldSnapshot.get_shared()'''
+    changes = {}
+    lastActions = view.lastActions
+
+    # check for walls
+    d1, d2 = [gs.distance((view.pos[0] + 300*math.cos(math.radians(view.heading+turn)),
+        view.pos[1] - 300*math.sin(math.radians(view.heading+turn))), shared[3]) for turn in (-45, 45)]
+    r = shared[4]
+    if d1 >= r or d2 >= r:
+        if d1 >= r: changes["turnDir"] = lastActions = "left"
+        else: changes["turnDir"] = lastActions = "right"
+        if view.speed > 5: changes["changeSpeed"] = "up"
+        return changes, lastActions, False
+    elif isinstance(lastActions, str):
+        lastActions = 0
+
+    # check for other cars
+    ahead = get_car_ahead(view, shared, 400, 120)
+    if ahead != None:
+        changes["changeSpeed"] = "up"
+        headingDif = gs.towards(view.pos, ahead, view.heading) - view.heading
+        if headingDif > 0: changes["turnDir"] = "right"
+        elif headingDif < 0: changes["turnDir"] = "left"
+        return changes, lastActions, False
+
+    # move away from wall
+    if isinstance(lastActions, int):
+        if lastActions == 15:
+            lastActions = None
+        else:
+            changes["changeSpeed"] = "up"
+            return changes, lastActions+1, False
+
+    # collect debris
+    if not view.collecting:
+        return changes, lastActions, False
+    if view.target != None:
+        value, pos = view.target
+        headingDif = view.heading - gs.towards(view.pos, pos, view.heading)
+        if headingDif > 10: changes["turnDir"] = "right"
+        elif headingDif < -10: changes["turnDir"] = "left"
+        else: changes["turnDir"] = None
+
+        if value/7 > view.speed: changes["changeSpeed"] = "up"
+        else: changes["changeSpeed"] = "down"
+    else:
+        changes["turnDir"] = None
+    return changes, lastActions, True
+
+def get_car_ahead(view, shared, radius, angle):
+    '''get_car_ahead(BotView, tuple, float, float) -> (x,y)
+    returns where the first car in Game.get_cars() order within radius of the bot
+    and less than angle from its heading was, or None if there isn't one'''
+    positions, tree, dead = shared[:3]
+    for i, j in sorted(tree.query(view.pos, radius)):
+        if i in dead or (i, j) == (view.index, 0): continue
+        headingDif = gs.towards(view.pos, positions[(i, j)], view.heading) - view.heading
+        if -angle < headingDif < angle:
+            return positions[(i, j)]
+
 class Dashboard(pygame.Surface):
     '''represents the dashboard'''
 
-    def __init__(self, game, rect, maxSpeed):
-        '''Dashboard(Game, tuple, int) -> Dashboard
-        constructs the dashboard for the game'''
+    def __init__(self, game, rect, maxSpeed, mapInterval=1):
+        '''Dashboard(Game, tuple, int, int) -> Dashboard
+        constructs the dashboard for the game
+        the map is redrawn every mapInterval updates'''
         pygame.Surface.__init__(self, rect[2:4], SRCALPHA)
         self.game = game
         self.rect = rect
         self.maxSpeed = maxSpeed
         self.speedometer = 0
         self.xpFull = 100
+        self.mapInterval = mapInterval
+        self.updates = 0
+
+        # the speedometer disc and ticks and the arena on the map don't change
+        # they are drawn once on surfaces with the same pixel format, to be copied over
+        self.background = pygame.Surface(rect[2:4], SRCALPHA)
+        radius = 110
+        x,y = self.rect[2]/2, self.rect[3]-40
+        pygame.draw.circle(self.background, (0, 0, 0, 130), (x,y), radius)
+        degrees = 180
+        while degrees >= 0:
+            radians = math.radians(degrees)
+            pygame.draw.line(self.background, "red", (x+radius*math.cos(radians), y-radius*math.sin(radians)),
+                (x+(radius-15)*math.cos(radians), y-(radius-15)*math.sin(radians)), 3)
+            degrees -= 15
+
+        half = self.game.get_center()[0]
+        self.mapBackground = pygame.Surface((110, 110), SRCALPHA)
+        pygame.draw.circle(self.mapBackground, (200, 200, 200, 170), (55, 55), 50*(half-50)/half)
+        pygame.draw.circle(self.mapBackground, (230, 0, 0, 170), (55, 55), 50*(half-50)/half+4, 5)
+        self.map = pygame.Surface((110, 110), SRCALPHA)
+
+    def get_map_interval(self):
+        '''Dashboard.get_map_interval() -> int
+        returns how many updates the map is redrawn after'''
+        return self.mapInterval
+
+    def set_map_interval(self, mapInterval):
+        '''Dashboard.set_map_interval(int) -> None
+        redraws the map every mapInterval updates'''
+        self.mapInterval = mapInterval
 
     def update(self):
         '''Dashboard.update() -> None
         updates the dashboard'''
-        self.fill(0)
+        # copy the pixels of the background over everything, alpha and all
+        self.get_buffer().write(self.background.get_buffer().raw)
         
         # draw speedometer
         self.speedometer = abs(self.game.get_player().get_speed())
         radius = 110
         x,y = self.rect[2]/2, self.rect[3]-40
-        pygame.draw.circle(self, (0, 0, 0, 130), (x,y), radius)
-        degrees = 180
-        while degrees >= 0:
-            radians = math.radians(degrees)
-            pygame.draw.line(self, "red", (x+radius*math.cos(radians), y-radius*math.sin(radians)),
-                (x+(radius-15)*math.cos(radians), y-(radius-15)*math.sin(radians)), 3)
-            degrees -= 15
         needle = 180-180*self.speedometer/self.maxSpeed
         base = 6
         pygame.draw.circle(self, "green", (x,y), base)
@@ -575,26 +1053,21 @@ class Dashboard(pygame.Surface):
             (x+(radius-10)*math.cos(math.radians(needle)), y-(radius-10)*math.sin(math.radians(needle))),
             (x+base*math.cos(math.radians(needle+90)), y-base*math.sin(math.radians(needle+90)))))
 
-        # draw map
-        surface = pygame.Surface((110, 110), SRCALPHA)
-        pygame.draw.circle(surface, (200, 200, 200, 170), (55, 55), 50*1950/2000)
-        pygame.draw.circle(surface, (230, 0, 0, 170), (55, 55), 50*1950/2000+4, 5)
-
         # draw cars on map
-        for worm in self.game.get_cars():
-            x,y = worm.head()
-            size = 2
-            if worm == self.game.get_player(True): size = 3
-            if not worm.is_dead():
-                pygame.draw.circle(surface, worm[0].get_color(), (x/(2000/55), y/(2000/55)), size)
-                polygon = []
-                for car in worm:
-                    if car.can_move():
-                        polygon.append((round(car.xcor()/(2000/55)), round(car.ycor()/(2000/55))))
+        if self.updates % self.mapInterval == 0:
+            half = self.game.get_center()[0]
+            self.map.get_buffer().write(self.mapBackground.get_buffer().raw)
+            for worm, trail in self.game.get_snapshot().get_trails():
+                x,y = trail[0]
+                size = 2
+                if worm == self.game.get_player(True): size = 3
+                pygame.draw.circle(self.map, worm[0].get_color(), (x/(half/55), y/(half/55)), size)
+                polygon = [(round(x/(half/55)), round(y/(half/55))) for x, y in trail]
                 if len(polygon) > 1:
-                    pygame.draw.lines(surface, worm[0].get_color(), False, polygon, 2)
+                    pygame.draw.lines(self.map, worm[0].get_color(), False, polygon, 2)
+        self.updates += 1
                 
-        self.game.blit(surface, (510, 105), True, True, self)
+        self.game.blit(self.map, (510, 105), True, True, self)
 
         # draw xp meter
         rect = (21, 135, 150*self.game.get_player(True).get_xp()/self.xpFull, 25)
@@ -619,7 +1092,7 @@ class EndScreen(gs.Sprite):
         self.bodyFont = pygame.font.SysFont("Arial", 15, True)
         self.game = game
         self.isActivate = False
-        self.restart = gs.Button(self.game, pygame.image.load("restart.png"), pos=(300, 155), command=self.game.__init__)
+        self.restart = gs.Button(self.game, pygame.image.load("restart.png"), pos=(300, 155), command=self.game.new_match)
         self.high = self.get_high()
 
     def activated(self):
@@ -645,10 +1118,11 @@ class EndScreen(gs.Sprite):
             self.save_high(int(score))
             newHigh = " (New!)"
             
-        header = self.headerFont.render(top, True, "white")
-        body1 = self.bodyFont.render(f"Rank: {int(rank)}   Time: {round(time*10)/10}", True, "white")
-        body2 = self.bodyFont.render(f"Score: {int(score)}   Kills: {int(kills)}", True, "white")
-        body3 = self.bodyFont.render(f"High Score: {int(self.high)}{newHigh}", True, "white")
+        text = self.game.get_text_cache()
+        header = text.render(self.headerFont, top, True, "white")
+        body1 = text.render(self.bodyFont, f"Rank: {int(rank)}   Time: {round(time*10)/10}", True, "white")
+        body2 = text.render(self.bodyFont, f"Score: {int(score)}   Kills: {int(kills)}", True, "white")
+        body3 = text.render(self.bodyFont, f"High Score: {int(self.high)}{newHigh}", True, "white")
 
         # add everything on screen
         self.game.blit(header, (175, 25), True, True, self.surface())
@@ -688,49 +1162,73 @@ class EndScreen(gs.Sprite):
 class Game(gs.Game):
     '''represents the main game object'''
 
-    def __init__(self):
-        '''Game() -> Game
-        constructs the game'''
-        gs.Game.__init__(self)
+    # recolored sprites and their rotations shared by every car and every match
+    spriteCache = gs.Cache(256)
+    rotations = gs.RotationAtlas(2)
+
+    # kind: (image attribute, value, pad, smallest and largest size, size scale)
+    # a piece is randint(smallest, largest)/scale times the size of the image and worth that times value
+    debrisKinds = {"gascan": ("gascan", 8, 0, 3, 5, 4), "battery": ("battery", 15, 0, 4, 6, 5),
+        "cone": ("cone", -35, 5, 4, 6, 5)}
+
+    def __init__(self, headless=False, config=None, profiler=None):
+        '''Game(bool, MatchConfig, gs.Profiler) -> Game
+        constructs the game
+        if headless, no window is opened, nothing is drawn and every worm is a bot
+        if profiler is given, it is used instead of a new one'''
+        gs.Game.__init__(self, headless)
+        if profiler != None: self.profiler = profiler
+        if config == None: config = MatchConfig()
+        self.config = config
+        # set before any clocks start, so headless clocks all run on ticks
+        self.set_timestep(1/60)
+        self.set_fps(60)
 
         # display settings
-        pygame.display.set_icon(pygame.transform.rotozoom(pygame.image.load("icon.png"), -20, 1))
-        pygame.display.set_caption("Demolition Derby")
-        self.screen = pygame.display.set_mode((600,600))
-        load = pygame.font.SysFont("Arial", 50, True)
-        self.blit(load.render("Loading Game...", True, "red"), (300, 300), True, True)
-        pygame.display.update()
+        if not headless:
+            pygame.display.set_icon(pygame.transform.rotozoom(pygame.image.load("icon.png"), -20, 1))
+            self.profiler.count("rotozoom")
+            pygame.display.set_caption("Demolition Derby")
+            self.screen = pygame.display.set_mode((600,600))
+            load = pygame.font.SysFont("Arial", 50, True)
+            self.blit(load.render("Loading Game...", True, "red"), (300, 300), True, True)
+            pygame.display.update()
 
         # create arena
         self.fieldSize = 0, 0, 600, 500
-        self.arenaSize = 4000
-        self.field = pygame.Surface((self.arenaSize, self.arenaSize))
-        self.spots = [(self.get_random_coords(), random.randint(5,12)) for i in range(300)]
+        self.arenaSize = config.arenaSize
+        self.sizeFactor = 1
+        self.field = None
+        if not headless:
+            size = self.screen.get_size()
+            self.field = gs.Camera((size[0]/self.sizeFactor, size[1]/self.sizeFactor))
+        self.spots = [(self.get_random_coords(), random.randint(5,12)) for i in range(round(300*(self.arenaSize/4000)**2))]
+        self.spotGrid = gs.SpatialHash(128)
+        for i in range(len(self.spots)):
+            self.spotGrid.add(i, self.spots[i][0])
+        self.tileSize = 512
+        self.arenaTiles = gs.Cache(24)
+        self.world = CarWorld()
+        self.ticks = 0
         
-        # car colors
-        numCars = 12
-        colors = [(237, 28, 36), (255, 127, 39), (242, 231, 0), (34, 177, 76),
-            (63, 72, 204), (163, 73, 164), (0, 0, 0), (226, 16, 153), (230, 230, 230),
-            (0, 0, 90), (0, 90, 0), (120, 0, 0), (0, 232, 232)]
-        carColors = []
-        for i in range(numCars):
-            color = random.choices(colors)
-            colors.remove(color[0])
-            carColors.append(color[0])
+        # car colors, with one scaled tire kept for each
+        self.tires = {}
+        numCars = config.numWorms
+        carColors = self.get_colors(numCars)
+        spawns = self.get_spawns(numCars)
         
         # player car
-        self.player = Worm(self, carColors[0], True)
-        self.player[0].pos(self.polar_coords(500, 90))
+        if headless: self.player = BotWorm(self, carColors[0], False)
+        else: self.player = Worm(self, carColors[0], True)
+        self.player[0].pos(spawns[0][0])
         self.follow = self.player
         
         # opponent cars
         self.cars = []
         self.opponents = [BotWorm(self, carColors[i+1], False) for i in range(numCars-1)]
-        heading = 90
-        for opponent in self.opponents:
-            heading += 360/(numCars)
-            opponent[0].pos(self.polar_coords(500, heading))
-            opponent[0].heading(heading)
+        for opponent, spawn in zip(self.opponents, spawns[1:]):
+            opponent[0].pos(spawn[0])
+            opponent[0].heading(spawn[1])
             self.cars.append(opponent)
         self.cars.append(self.player)
             
@@ -739,10 +1237,15 @@ class Game(gs.Game):
         self.ROAD = (100, 100, 100)
         self.SPOT = (110, 110, 110)
         self.dashboard = Dashboard(self, (0, 430, 600, 200), self.player[0].get_max())
-        self.battery = pygame.transform.rotozoom(pygame.image.load("battery.png").convert_alpha(), 0, 0.35)
-        self.cone = pygame.transform.rotozoom(pygame.image.load("cone.png").convert_alpha(), 0, 0.5)
-        self.gascan = pygame.transform.rotozoom(pygame.image.load("gascan.png").convert_alpha(), 0, 0.6)
-        self.debris = []
+        self.battery = pygame.transform.rotozoom(gs.load_image("battery.png"), 0, 0.35)
+        self.cone = pygame.transform.rotozoom(gs.load_image("cone.png"), 0, 0.5)
+        self.gascan = pygame.transform.rotozoom(gs.load_image("gascan.png"), 0, 0.6)
+        self.profiler.count("rotozoom", 3)
+        self.debris = DebrisStore()
+        self.debrisGrid = gs.SpatialHash(128)
+        self.debrisClusters = DebrisClusters()
+        self.snapshot = None
+        self.decisionPool = gs.WorkerPool(config.decisionWorkers, config.decisionProcesses)
         self.dead = []
         self.win = False
         self.end = EndScreen(self)
@@ -750,7 +1253,11 @@ class Game(gs.Game):
         self.indicator = ""
         self.indicFont = pygame.font.SysFont("Arial", 22, True)
         self.scoreFont = pygame.font.SysFont("Arial", 15, True)
-        self.sizeFactor = 1
+        self.profilerFont = pygame.font.SysFont("Courier New", 13, True)
+        self.textCache = gs.TextCache(64)
+        self.profiler.add_stages("snapshot", "field", "dead", "debris", "cars", "wall",
+            "blit", "dashboard", "text", "display")
+        self.profiler.add_counters("hit_other", "is_in_rect")
         self.score = 0
         self.stopped = False
         self.paused = False
@@ -761,27 +1268,85 @@ class Game(gs.Game):
         self.started = False
 
         # add debris
-        for i in range(150):
-            size = random.randint(3,5)/4
-            self.debris.append((self.get_random_coords(), 8*size, 0,
-                pygame.transform.rotozoom(self.gascan, 0, size)))
-        for i in range(70):
-            size = random.randint(4,6)/5
-            self.debris.append((self.get_random_coords(), 15*size, 0,
-                pygame.transform.rotozoom(self.battery, 0, size)))
-        for i in range(30):
-            size = random.randint(4,6)/5
-            self.debris.append((self.get_random_coords(), -35*size, 5,
-                pygame.transform.rotozoom(self.cone, 0, size)))
+        # every piece of one kind and size shares one image
+        self.debrisImages = {}
+        for kind in self.debrisKinds:
+            image, value, pad, low, high, scale = self.debrisKinds[kind]
+            for size in range(low, high+1):
+                self.debrisImages[kind, size/scale] = pygame.transform.rotozoom(getattr(self, image), 0, size/scale)
+                self.profiler.count("rotozoom")
+        for i in range(round(config.numDebris*3/5)):
+            self.spawn_debris("gascan")
+        for i in range(round(config.numDebris*7/25)):
+            self.spawn_debris("battery")
+        for i in range(config.numDebris - round(config.numDebris*3/5) - round(config.numDebris*7/25)):
+            self.spawn_debris("cone")
 
         # paused screen
-        pausedFont = pygame.font.SysFont("Arial", 70, True)
-        self.pausedScreen = pygame.Surface(self.screen.get_size(), SRCALPHA).convert_alpha()
-        self.pausedScreen.fill((0,0,0,150))
-        self.blit(pausedFont.render("Game Paused", True, "white"), (300, 300), True, True, self.pausedScreen)
+        if not headless:
+            pausedFont = pygame.font.SysFont("Arial", 70, True)
+            self.pausedScreen = pygame.Surface(self.screen.get_size(), SRCALPHA).convert_alpha()
+            self.pausedScreen.fill((0,0,0,150))
+            self.blit(pausedFont.render("Game Paused", True, "white"), (300, 300), True, True, self.pausedScreen)
+
+        self.after(10000, self.replenish_debris)
+        if headless: self.start()
+
+    def get_config(self):
+        '''Game.get_config() -> MatchConfig
+        returns the settings of the match'''
+        return self.config
+
+    def new_match(self):
+        '''Game.new_match() -> None
+        starts over with the same settings and profiler'''
+        self.decisionPool.close()
+        self.__init__(self.headless, self.config, self.profiler)
+
+    def get_center(self):
+        '''Game.get_center() -> (x,y)
+        returns the center of the arena'''
+        return self.arenaSize/2, self.arenaSize/2
+
+    def get_wall_radius(self):
+        '''Game.get_wall_radius() -> float
+        returns how far from the center the front of a car hits the wall'''
+        return self.arenaSize/2-85
+
+    def get_colors(self, num):
+        '''Game.get_colors(int) -> list
+        returns num colors for the worms
+        the first ones are picked at random, then hues are spread out by the golden ratio'''
+        colors = [(237, 28, 36), (255, 127, 39), (242, 231, 0), (34, 177, 76),
+            (63, 72, 204), (163, 73, 164), (0, 0, 0), (226, 16, 153), (230, 230, 230),
+            (0, 0, 90), (0, 90, 0), (120, 0, 0), (0, 232, 232)]
+        carColors = []
+        for i in range(min(num, len(colors))):
+            color = random.choices(colors)
+            colors.remove(color[0])
+            carColors.append(color[0])
 
-        self.replenishEvent = pygame.event.custom_type()
-        pygame.time.set_timer(self.replenishEvent, 10000)
+        for i in range(num-len(carColors)):
+            color = pygame.Color(0)
+            color.hsva = (i*0.618033988749895 % 1*360, 75, 90, 100)
+            carColors.append(tuple(color)[:3])
+        return carColors
+
+    def get_spawns(self, num):
+        '''Game.get_spawns(int) -> list
+        returns ((x,y), heading) for num worms on rings around the center, facing out
+        rings are 300 apart and worms on a ring at least 150 apart'''
+        spawns = []
+        radius = 500
+        while len(spawns) < num:
+            if radius > self.arenaSize/2-300:
+                raise ValueError(f"{num} worms don't fit in an arena of size {self.arenaSize}")
+            ring = min(num-len(spawns), int(2*math.pi*radius/150))
+            for i in range(ring):
+                heading = 90 + i*360/ring
+                spawns.append((self.polar_coords(radius, heading), heading))
+            radius += 300
+        return spawns
 
     def following(self, worm=None):
         '''Game.following(Worm) -> None/Worm
@@ -790,10 +1355,60 @@ class Game(gs.Game):
         self.follow = worm
 
     def get_field(self):
-        '''Game.get_field() -> Surface
-        returns the surface for the arena'''
+        '''Game.get_field() -> Camera
+        returns the camera surface for the arena'''
         return self.field
 
+    def get_text_cache(self):
+        '''Game.get_text_cache() -> gs.TextCache
+        returns the cache of rendered text'''
+        return self.textCache
+
+    def get_dashboard(self):
+        '''Game.get_dashboard() -> Dashboard
+        returns the dashboard'''
+        return self.dashboard
+
+    def get_world(self):
+        '''Game.get_world() -> CarWorld
+        returns the world holding the state of every car'''
+        return self.world
+
+    def get_arena_tile(self, tile):
+        '''Game.get_arena_tile((int, int)) -> Surface
+        returns the square tile of the static arena layer (road and spots) at tile
+        tiles are drawn when they come into view and only the most recently used are kept,
+        so the memory used doesn't grow with the arena'''
+        surface = self.arenaTiles.get(tile)
+        if surface == None:
+            size = self.tileSize
+            left, top = tile[0]*size, tile[1]*size
+            surface = pygame.Surface((size, size)).convert()
+            surface.fill((210, 0, 0))
+            pygame.draw.circle(surface, self.ROAD, (self.arenaSize/2-left, self.arenaSize/2-top), self.arenaSize/2-50)
+            rect = pygame.Rect(left, top, size, size)
+            # spots are drawn in the order they were made, so overlapping spots look the same on every tile
+            for i in sorted(self.spotGrid.query_rect(rect.inflate(30, 30))):
+                spot = self.spots[i]
+                pygame.draw.circle(surface, self.SPOT, (spot[0][0]-left, spot[0][1]-top), spot[1])
+            self.arenaTiles.set(tile, surface)
+
+        return surface
+
+    def invalidate_arena(self):
+        '''Game.invalidate_arena() -> None
+        makes the arena tiles get redrawn on next use'''
+        self.arenaTiles.clear()
+
+    def in_view(self, radius):
+        '''Game.in_view(int) -> bool
+        returns if the whole view is within radius of the arena center'''
+        rect = self.field.get_view_rect()
+        for corner in (rect.topleft, rect.topright, rect.bottomleft, rect.bottomright):
+            if gs.distance(corner, (self.arenaSize/2, self.arenaSize/2)) > radius:
+                return False
+        return True
+
     def get_player(self, wholeChain=False):
         '''Game.get_player(bool) -> Car
         returns the player'''
@@ -810,11 +1425,61 @@ class Game(gs.Game):
         returns all cars'''
         return self.cars
 
+    def set_decision_workers(self, workers, processes=True):
+        '''Game.set_decision_workers(int, bool) -> None
+        makes the bots decide in workers processes, or threads if not processes
+        with 0 workers, bots decide in the main thread
+        the workers are kept for new matches'''
+        self.config.decisionWorkers, self.config.decisionProcesses = workers, processes
+        self.decisionPool.close()
+        self.decisionPool = gs.WorkerPool(workers, processes)
+
+    def decide_bots(self):
+        '''Game.decide_bots() -> None
+        has every live bot decide from the snapshot in the decision pool
+        then applies the decisions in the order of get_cars()'''
+        bots = [(i, self.cars[i]) for i in range(len(self.cars))
+            if isinstance(self.cars[i], BotWorm) and not self.cars[i].is_dead() and self.is_deciding(i)]
+        views = [worm.get_view(i) for i, worm in bots]
+        decisions = self.decisionPool.map(decide_bots, views, self.get_snapshot().get_shared())
+        for (i, worm), decision in zip(bots, decisions):
+            worm.apply(decision)
+
+    def is_deciding(self, i):
+        '''Game.is_deciding(int) -> bool
+        returns if worm i decides this tick
+        worms far from the followed worm only decide every few ticks, taking turns'''
+        if self.config.lodDistance == None or self.cars[i] == self.follow: return True
+        if gs.distance(self.cars[i].head(), self.follow.head()) <= self.config.lodDistance: return True
+        return (self.ticks+i) % self.config.lodInterval == 0
+
+    def take_snapshot(self):
+        '''Game.take_snapshot() -> None
+        saves where the cars are for finding nearby cars this frame'''
+        self.snapshot = WorldSnapshot(self)
+
+    def get_snapshot(self):
+        '''Game.get_snapshot() -> WorldSnapshot
+        returns where the cars were at the start of the frame'''
+        if self.snapshot == None: self.take_snapshot()
+        return self.snapshot
+
+    def get_cars_near(self, pos, radius):
+        '''Game.get_cars_near((x,y), float) -> list
+        returns (Worm, Car) for the cars of live worms that were near pos when the frame started
+        cars are in the same order as get_cars()'''
+        return self.get_snapshot().get_cars_near(pos, radius)
+
     def get_debris(self):
-        '''Game.get_debris() -> list
-        returns a list of debris'''
+        '''Game.get_debris() -> DebrisStore
+        returns the store of debris'''
         return self.debris
 
+    def get_debris_clusters(self):
+        '''Game.get_debris_clusters() -> DebrisClusters
+        returns the debris grouped into cells by value'''
+        return self.debrisClusters
+
     def add_dead(self, worm):
         '''Game.add_dead(Worm) -> None
         adds worm to dead worms'''
@@ -828,11 +1493,41 @@ class Game(gs.Game):
 
     def change_color(self, image, old=None, new=None, transparent=255):
         '''Game.change_color(tuple, tuple) -> pygame.Surface
-        returns a surface with old and new colors switched'''
+        returns a surface with old and new colors switched
+        surfaces for image files are cached and shared, so don't draw on them'''
         if isinstance(image, pygame.Surface):
-            surface = image
-        else:
-            surface = pygame.image.load(image).convert_alpha()
+            return self.recolor(image, old, new, transparent)
+
+        key = image, old, new, transparent
+        surface = self.spriteCache.get(key)
+        if surface == None:
+            surface = self.recolor(gs.load_image(image), old, new, transparent)
+            self.spriteCache.set(key, surface)
+        return surface
+
+    def get_tire(self, color):
+        '''Game.get_tire(tuple) -> pygame.Surface
+        returns the scaled tire of color
+        every car of a color shares it, so tires dropped as debris are pooled too
+        they are kept for the whole match instead of in the sprite cache, so none are made twice'''
+        if color not in self.tires:
+            self.tires[color] = pygame.transform.rotozoom(self.change_color("tire.png", (255, 255, 255), color), 0, 0.4)
+            self.profiler.count("rotozoom")
+        return self.tires[color]
+
+    def recolor(self, surface, old=None, new=None, transparent=255):
+        '''Game.recolor(pygame.Surface, tuple, tuple, int) -> pygame.Surface
+        switches old and new colors on surface and returns it'''
+        if gs.has_pixel_arrays(surface):
+            clear = gs.color_mask(surface, (127, 127, 127), False)
+            if new != None:
+                swap = gs.color_mask(surface, old)
+                clear &= ~swap
+            pygame.surfarray.pixels_alpha(surface)[:] = transparent
+            if new != None:
+                gs.fill_mask(surface, swap, list(new[:3])+[transparent])
+            gs.fill_mask(surface, clear, (0, 0, 0, 0))
+            return surface
 
         rect = surface.get_rect()
         for x in range(rect[2]):
@@ -854,10 +1549,21 @@ class Game(gs.Game):
         returns the rectangle coordinates for r and theta'''
         return self.arenaSize/2+r*math.cos(math.radians(theta)), self.arenaSize/2-r*math.sin(math.radians(theta))
 
-    def add_debris(self, *attri):
-        '''Game.add_desbris(tuple, int, int, pygame.Surface) -> None
-        adds a bit of debris to the game'''
-        self.debris.append(attri)
+    def add_debris(self, pos, value, pad, image, owner=None):
+        '''Game.add_debris((x,y), float, float, pygame.Surface, Car) -> int
+        adds a bit of debris to the game that owner can't pick up and returns its handle'''
+        handle = self.debris.add(pos, value, pad, image, -1 if owner == None else owner.slot)
+        self.debrisGrid.add(handle, pos)
+        self.debrisClusters.add(handle, pos, value)
+        return handle
+
+    def remove_debris(self, handle):
+        '''Game.remove_debris(int) -> None
+        removes a bit of debris from the game'''
+        pos, value = self.debris.get_pos(handle), self.debris.get_value(handle)
+        self.debris.remove(handle)
+        self.debrisGrid.remove(handle, pos)
+        self.debrisClusters.remove(handle, pos, value)
 
     def show_indicator(self, num):
         '''Game.show_indicator(int) -> None
@@ -873,30 +1579,59 @@ class Game(gs.Game):
         for i in range(num-len(self.debris)):
             randomize = random.random()
             if randomize > 2/5:
-                size = random.randint(3,5)/4
-                self.debris.append((self.get_random_coords(), 8*size, 0,
-                    pygame.transform.rotozoom(self.gascan, 0, size)))
+                self.spawn_debris("gascan")
             elif randomize > 3/25:
-                size = random.randint(4,6)/5
-                self.debris.append((self.get_random_coords(), 15*size, 0,
-                    pygame.transform.rotozoom(self.battery, 0, size)))
+                self.spawn_debris("battery")
             else:
-                size = random.randint(4,6)/5
-                self.debris.append((self.get_random_coords(), -35*size, 5,
-                        pygame.transform.rotozoom(self.cone, 0, size)))
+                self.spawn_debris("cone")
+
+    def spawn_debris(self, kind):
+        '''Game.spawn_debris(str) -> None
+        adds a gascan, battery or cone of random size at random coordinates'''
+        image, value, pad, low, high, scale = self.debrisKinds[kind]
+        size = random.randint(low, high)/scale
+        self.add_debris(self.get_random_coords(), value*size, pad, self.debrisImages[kind, size])
+
+    def replenish_debris(self):
+        '''Game.replenish_debris() -> None
+        replenishes the debris and does it again in 10 seconds'''
+        self.replenish(self.config.numDebris)
+        self.after(10000, self.replenish_debris)
 
     def stop(self):
         '''Game.stop() -> None
         stops movement on the board'''
         self.stopped = True
 
+    def is_stopped(self):
+        '''Game.is_stopped() -> bool
+        returns if movement on the board is stopped'''
+        return self.stopped
+
+    def get_winner(self):
+        '''Game.get_winner() -> Worm
+        returns the last worm alive, or None if there isn't just one'''
+        alive = [worm for worm in self.cars if worm not in self.dead]
+        if len(alive) == 1:
+            return alive[0]
+
+    def play_match(self, maxFrames=None):
+        '''Game.play_match(int) -> Worm
+        steps a headless game until one worm is left or maxFrames is reached
+        returns the winner'''
+        frames = 0
+        while not self.stopped and (maxFrames == None or frames < maxFrames):
+            self.step()
+            frames += 1
+        return self.get_winner()
+
     def event(self, event):
         '''Game.update(event) -> None
         checks event'''
-        if event.type == self.replenishEvent:
-            self.replenish(250)
-        elif event.type == KEYDOWN:
-            if event.key == K_SPACE and not self.stopped and self.started and not self.end.activated():
+        if event.type == KEYDOWN:
+            if event.key == K_F3:
+                self.profiler.show(not self.profiler.is_shown())
+            elif event.key == K_SPACE and not self.stopped and self.started and not self.end.activated():
                 if self.paused:
                     self.play_all_clocks()
                 else:
@@ -908,81 +1643,227 @@ class Game(gs.Game):
     def update(self):
         '''Game.update() -> None
         updates a single frame of the same'''
+        self.tick()
+        self.render()
+
+    def tick(self):
+        '''Game.tick() -> None
+        moves the game forward by one timestep'''
         if self.stopped or self.paused: return
-        
-        self.screen.fill((210, 0, 0))
-        
-        # prepare field
+        if self.started: self.simulate()
+
+        # end the match
+        if self.headless:
+            if len(self.cars) - len(self.dead) <= 1: self.stop()
+            return
+
+        end = self.get_end()
+        if end != None: self.end.end(self.score, len(self.cars) - len(self.dead) + 1,
+            self.player.get_kills(), self.clock.get_time(), end)
+
+    def is_idle(self):
+        '''Game.is_idle() -> bool
+        returns if the game is paused or stopped'''
+        return self.paused or self.stopped
+
+    def get_end(self):
+        '''Game.get_end() -> bool
+        returns True if the player has won, False if the player is out
+        and None if the game is still going'''
+        if len(self.cars) - len(self.dead) == 1 and not self.player.is_dead(): return True
+        elif len(self.cars) - len(self.dead) != 0 and self.player.is_dead(): return False
+
+    def render(self, alpha=1):
+        '''Game.render(float) -> None
+        draws the game alpha of the way between the last tick and the next one'''
+        if self.headless or self.stopped or self.paused: return
+
         if self.started:
-            self.field.fill((210, 0, 0))
-            pygame.draw.circle(self.field, self.ROAD, (self.arenaSize/2, self.arenaSize/2), self.arenaSize/2-50)
-            for spot in self.spots:
-                pygame.draw.circle(self.field, self.SPOT, spot[0], spot[1])
-
-            # update dead worms
-            for car in self.dead:
-                car.update()
-
-            # add gascans
-            for debris in self.debris[:]:
-                self.blit(debris[3], debris[0], True, True, self.field)
-                for worm in self.cars:
-                    if worm.is_dead():
-                        continue
-                    if not (len(debris) > 4 and debris[-1] in worm) and \
-                       is_in_rect(debris[0], worm[0].pos(), (60+debris[2], 110+debris[2]), worm[0].heading()):
-                        if debris in self.debris:
-                            self.debris.remove(debris)
-                            worm.add_xp(debris[1])
-                
-            # update cars
-            for car in self.cars:
-                if car not in self.dead:
-                    car.update()
-
-            pygame.draw.circle(self.field, (230, 0, 0), (self.arenaSize/2, self.arenaSize/2), self.arenaSize/2-50, 50)
-
-            # add everything on
-            rect, carp = self.fieldSize, self.follow.head()
-            blitRect = (rect[2]/2-self.sizeFactor*carp[0], rect[3]/2-self.sizeFactor*carp[1], rect[2], rect[3])
-            if self.sizeFactor == 1: self.blit(self.field, blitRect)
-            else: self.blit(pygame.transform.rotozoom(self.field, 0, self.sizeFactor), blitRect)
+            self.draw_field(alpha)
         else:
+            self.screen.fill((210, 0, 0))
             self.screen.blit(self.startScreen, (0,-20))
             self.play.update()
 
-        # win or lose the game
-        end = None
-        if len(self.cars) - len(self.dead) == 1 and not self.player.is_dead(): end = True
-        elif len(self.cars) - len(self.dead) != 0 and self.player.is_dead(): end = False
-        if end != None: self.end.end(self.score, len(self.cars) - len(self.dead) + 1,
-            self.player.get_kills(), self.clock.get_time(), end)
-
         # get rank
+        end = self.get_end()
         if end: rank = 1
         elif end == False: rank = len(self.cars) - len(self.dead) + 1
         else: rank = len(self.cars) - len(self.dead)
         
+        self.profiler.begin("dashboard")
         self.dashboard.update()
-        self.blit(self.indicFont.render(self.indicator, True, (255, 255, 255)), (96, 548), True, True)
-        self.blit(self.scoreFont.render("Score: "+str(round(self.score)), True, (255, 255, 255)), (96, 577), True, True)
-        if not self.end.activated(): self.blit(self.scoreFont.render("#"+str(rank), True, (255, 255, 255)), (6,5))
+        self.profiler.end("dashboard")
+        self.profiler.begin("text")
+        self.blit(self.textCache.render(self.indicFont, self.indicator, True, (255, 255, 255)), (96, 548), True, True)
+        self.blit(self.textCache.render(self.scoreFont, "Score: "+str(round(self.score)), True, (255, 255, 255)), (96, 577), True, True)
+        if not self.end.activated():
+            self.blit(self.textCache.render(self.scoreFont, "#"+str(rank), True, (255, 255, 255)), (6,5))
         self.end.update()
+        self.profiler.end("text")
+        if self.profiler.is_shown():
+            self.profiler.draw(self.screen, self.profilerFont, (self.screen.get_width()-245, 5))
+        self.profiler.begin("display")
         pygame.display.update()
+        self.profiler.end("display")
+
+    def simulate(self):
+        '''Game.simulate() -> None
+        moves everything on the board by a frame without drawing'''
+        for worm in self.cars:
+            for car in worm: car.save_position()
+        self.ticks += 1
+
+        # collect gascans near the front of each worm
+        # 70 covers half the diagonal of the largest pickup rect
+        self.profiler.begin("debris")
+        worms = [worm for worm in self.cars if not worm.is_dead()]
+        fronts = gs.OrientedRects([worm[0].pos() for worm in worms], (60, 110), [worm[0].heading() for worm in worms])
+        # the columns are read by row directly since nothing is removed until every hit is known
+        debris, rows = self.debris, self.debris.rows
+        near = []
+        for i in range(len(worms)):
+            slots = [car.slot for car in worms[i]]
+            for handle in self.debrisGrid.query(worms[i][0].pos(), 70):
+                row = rows[handle]
+                if debris.owner[row] == -1 or debris.owner[row] not in slots:
+                    near.append((i, handle, row))
+        hits = fronts.contains_pairs([(debris.x[row], debris.y[row]) for i, handle, row in near],
+            [i for i, handle, row in near], [debris.pad[row] for i, handle, row in near])
+        self.profiler.count("is_in_rect", len(near))
+        collected = set()
+        for j in range(len(near)):
+            i, handle, row = near[j]
+            if hits[j] and handle not in collected:
+                collected.add(handle)
+                worms[i].add_xp(debris.get_value(handle))
+                self.remove_debris(handle)
+        self.profiler.end("debris")
+            
+        # the snapshot is taken after pickup so cars added by xp can be found and hit this frame
+        self.profiler.begin("snapshot")
+        self.take_snapshot()
+        self.profiler.end("snapshot")
+
+        # update cars
+        self.profiler.begin("cars")
+        self.move_cars()
+        self.profiler.end("cars")
+
+    def move_cars(self):
+        '''Game.move_cars() -> None
+        updates every worm a phase at a time: the bots decide, every car moves,
+        every car follows the one in front of it, then the heads check for hits
+        if the world is batched, the cars are moved all at once'''
+        worms = self.dead + [worm for worm in self.cars if worm not in self.dead]
+        self.decide_bots()
+        if self.world.is_batched():
+            self.world.forward()
+            for worm in worms:
+                for car in worm: car.update(True)
+        else:
+            for worm in worms: worm.move()
+
+        # follow and check for hits
+        worms = [worm for worm in worms if len(worm.dead) < len(worm)]
+        if not self.world.is_batched():
+            for worm in worms: worm.follow()
+            for worm in worms: worm.check_hits(worm[0] not in worm.dead and worm[0].hit_wall())
+            return
+
+        self.world.follow(worms)
+        walls = self.world.hit_walls([worm[0] for worm in worms], self.get_center(), self.get_wall_radius())
+
+        # test the front of every head against the cars near it at once
+        # a head isn't tested against itself or worms that are already dead
+        near = [self.get_cars_near(worm[0].pos(), worm.reach) for worm in worms]
+        points, slots, tested = [], [], []
+        for worm, cars in zip(worms, near):
+            front = worm[0].get_front()
+            tested.append([car != worm[0] and not other.is_dead() for other, car in cars])
+            for (other, car), test in zip(cars, tested[-1]):
+                if test:
+                    points.extend(front)
+                    slots.extend((car.slot, car.slot))
+        hits = iter(self.world.get_rects(Car.hitSize).contains_pairs(points, slots))
+        self.profiler.count("hit_other", len(points)//2)
+        self.profiler.count("is_in_rect", len(points))
+
+        for worm, wall, cars, tests in zip(worms, walls, near, tested):
+            worm.check_hits(wall and worm[0] not in worm.dead, cars,
+                [test and (next(hits) | next(hits)) for test in tests])
+
+    def draw_field(self, alpha=1):
+        '''Game.draw_field(float) -> None
+        draws the part of the arena around the followed worm on the screen
+        cars are drawn alpha of the way between the last tick and this one'''
+        rect, carp = self.fieldSize, self.follow.head_car().draw_pos(alpha)
+        self.profiler.begin("field")
+        self.field.set_view((carp[0]-rect[2]/2/self.sizeFactor, carp[1]-rect[3]/2/self.sizeFactor))
+
+        # prepare field
+        view, size = self.field.get_view_rect(), self.tileSize
+        if not pygame.Rect(0, 0, self.arenaSize, self.arenaSize).contains(view):
+            self.field.fill((210, 0, 0))
+        for x in range(max(0, view.left//size), min(math.ceil(self.arenaSize/size), (view.right-1)//size+1)):
+            for y in range(max(0, view.top//size), min(math.ceil(self.arenaSize/size), (view.bottom-1)//size+1)):
+                self.field.blit(self.get_arena_tile((x, y)), (x*size, y*size))
+        self.profiler.end("field")
+
+        # draw dead worms, debris, then cars
+        self.profiler.begin("dead")
+        for worm in self.dead:
+            for car in worm: car.draw(alpha)
+        self.profiler.end("dead")
+        self.profiler.begin("debris")
+        debris, rows = self.debris, self.debris.rows
+        for handle in self.debrisGrid.query_rect(self.field.get_view_rect().inflate(200, 200)):
+            row = rows[handle]
+            image, x, y = debris.images[debris.image[row]], debris.x[row], debris.y[row]
+            width, height = image.get_size()
+            if self.field.is_visible((x-width/2, y-height/2, width, height)):
+                self.blit(image, (x, y), True, True, self.field)
+        self.profiler.end("debris")
+        self.profiler.begin("cars")
+        for worm in self.cars:
+            if worm not in self.dead:
+                for car in worm: car.draw(alpha)
+        self.profiler.end("cars")
+
+        self.profiler.begin("wall")
+        # the wall is drawn over the cars, only when it is in view
+        if not self.in_view(self.arenaSize/2-100):
+            self.field.circle((230, 0, 0), self.get_center(), self.arenaSize/2-50, 50)
+        self.profiler.end("wall")
+
+        # add everything on
+        self.profiler.begin("blit")
+        if self.sizeFactor == 1: self.blit(self.field, (0,0))
+        else:
+            self.blit(pygame.transform.rotozoom(self.field, 0, self.sizeFactor), (0,0))
+            self.profiler.count("rotozoom")
+        self.profiler.end("blit")
 
     def get_random_coords(self):
         '''Game.get_random_coords() -> (x,y)
         returns random coordinates'''
-        coords = random.randrange(4000), random.randrange(4000)
-        while gs.distance(coords, (2000, 2000)) > 1500:
-            coords = random.randrange(4000), random.randrange(4000)
+        coords = random.randrange(self.arenaSize), random.randrange(self.arenaSize)
+        while gs.distance(coords, self.get_center()) > self.arenaSize/2-500:
+            coords = random.randrange(self.arenaSize), random.randrange(self.arenaSize)
         return coords
 
 def is_in_rect(point, center, size, angle):
     '''is_in_rect(tuple, tuple, tuple, angle) -> bool
     returns if point is in rect with center, size, and angle'''
-    pos = complex(point[0]-center[0], point[1]-center[1])*pow(math.e, math.radians(angle)*complex(0,1))
-    return -size[1]/2 < pos.real < size[1]/2 and -size[0]/2 < pos.imag < size[0]/2
+    dx, dy, angle = point[0]-center[0], point[1]-center[1], math.radians(angle)
+    along, across = dx*math.cos(angle) - dy*math.sin(angle), dx*math.sin(angle) + dy*math.cos(angle)
+    return -size[1]/2 < along < size[1]/2 and -size[0]/2 < across < size[0]/2
     
 pygame.init()
-Game().mainloop()
+if __name__ == "__main__":
+    # python demolition_derby.py --profile samples.csv streams the time of every stage of every frame
+    import sys
+    game = Game()
+    if "--profile" in sys.argv[1:-1]:
+        game.get_profiler().stream(sys.argv[sys.argv.index("--profile")+1])
+    game.mainloop()
@@ -9,14 +9,81 @@
 # It also in a variety of different objects to make
 # coding your game easier in general.
 
-import pygame, time, math, random
+import pygame, time, math, random, collections, heapq, itertools, weakref, csv
+import concurrent.futures
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 class GameSetupError(Exception):
     '''error for the gamesetup module'''
 
+class Timebase:
+    '''represents a monotonic time in seconds that can be paused
+    a manual timebase only moves forward with Timebase.advance(seconds)'''
+
+    def __init__(self):
+        '''Timebase() -> Timebase
+        constructs a running timebase starting at 0'''
+        self.offset = time.perf_counter()
+        self.frozen = None
+        self.paused = False
+        self.manual = False
+
+    def get_time(self):
+        '''Timebase.get_time() -> float
+        returns the time in seconds, not counting time paused'''
+        if self.frozen != None: return self.frozen
+        return time.perf_counter()-self.offset
+
+    def is_paused(self):
+        '''Timebase.is_paused() -> bool
+        returns if the timebase is paused'''
+        return self.paused
+
+    def pause(self):
+        '''Timebase.pause() -> None
+        stops the time until Timebase.play() is called'''
+        if self.frozen == None: self.frozen = self.get_time()
+        self.paused = True
+
+    def play(self):
+        '''Timebase.play() -> None
+        starts the time again after Timebase.pause()'''
+        self.paused = False
+        if not self.manual and self.frozen != None:
+            self.offset = time.perf_counter()-self.frozen
+            self.frozen = None
+
+    def is_manual(self):
+        '''Timebase.is_manual() -> bool
+        returns if the time only moves with Timebase.advance'''
+        return self.manual
+
+    def set_manual(self, boolean):
+        '''Timebase.set_manual(bool) -> None
+        sets if the time only moves with Timebase.advance'''
+        self.manual = boolean
+        if boolean and self.frozen == None:
+            self.frozen = self.get_time()
+        elif not boolean and not self.paused:
+            self.play()
+
+    def advance(self, seconds):
+        '''Timebase.advance(float) -> None
+        moves a manual timebase forward by seconds if it isn't paused'''
+        if self.manual and not self.paused:
+            self.frozen += seconds
+
+# the timebase for clocks not registered with a game
+_timebase = Timebase()
+
 class Clock:
     '''represents a stopwatch that keeps track of time in seconds
-   the clock starts out paused, so don't forget to play it!'''
+   the clock starts out paused, so don't forget to play it!
+   clocks registered with a game read the game's timebase, so they pause with it'''
 
     def __init__(self, maxTime=None, **game):
         '''Clock() -> Clock
@@ -31,8 +98,9 @@ class Clock:
         self.startTime = None
         self.saved = 0
         self.maxTime = maxTime
+        self.timebase = _timebase
+        self.game = None
         if "game" in game: game["game"].register_clock(self)
-        else: self.game = None
 
     def get_max(self):
         '''Clock.get_max() -> float/int
@@ -48,7 +116,7 @@ class Clock:
         '''Clock.get_time() -> float
         returns the current time on the stopwatch'''
         if self.startTime == None: return self.saved
-        currentTime = time.time()-self.startTime+self.saved
+        currentTime = self.timebase.get_time()-self.startTime+self.saved
         if self.maxTime != None and currentTime > self.maxTime:
             return self.maxTime
         return currentTime
@@ -77,7 +145,588 @@ class Clock:
         '''Clock.start() -> None
         starts the stopwatch.
         stopwatch may be stopped using Clock.stop()'''
-        self.startTime = time.time()
+        self.startTime = self.timebase.get_time()
+
+    def is_running(self):
+        '''Clock.is_running() -> bool
+        returns if the stopwatch is running'''
+        return self.startTime != None
+
+class Cache:
+    '''represents a store of values with a maximum size
+    when full, the least recently used value is forgotten'''
+
+    def __init__(self, maxSize=128):
+        '''Cache(int) -> Cache
+        constructs an empty cache'''
+        self.maxSize = maxSize
+        self.values = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        '''len(Cache) -> int
+        returns the number of values in the cache'''
+        return len(self.values)
+
+    def __contains__(self, key):
+        '''key in Cache -> bool
+        returns if key has a value in the cache'''
+        return key in self.values
+
+    def get_hits(self):
+        '''Cache.get_hits() -> int
+        returns the number of times get found a value'''
+        return self.hits
+
+    def get_misses(self):
+        '''Cache.get_misses() -> int
+        returns the number of times get did not find a value'''
+        return self.misses
+
+    def get(self, key, default=None):
+        '''Cache.get(key, default=None) -> value
+        returns the value for key or default if key is not in the cache'''
+        if key not in self.values:
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        self.values.move_to_end(key)
+        return self.values[key]
+
+    def set(self, key, value):
+        '''Cache.set(key, value) -> None
+        stores value for key, forgetting the oldest value if full'''
+        self.values[key] = value
+        self.values.move_to_end(key)
+        while len(self.values) > self.maxSize:
+            self.values.popitem(False)
+
+    def remove(self, key):
+        '''Cache.remove(key) -> None
+        forgets the value for key if there is one'''
+        self.values.pop(key, None)
+
+    def clear(self):
+        '''Cache.clear() -> None
+        forgets all values and resets the counters'''
+        self.values.clear()
+        self.hits = 0
+        self.misses = 0
+
+class TextCache(Cache):
+    '''represents a cache of rendered text keyed by (font, text, antialias, color)
+    the surfaces are shared, so they shouldn't be drawn on'''
+
+    def render(self, font, text, antialias, color):
+        '''TextCache.render(pygame.font.Font, str, bool, color) -> pygame.Surface
+        returns text rendered in font, only rendering it if it isn't in the cache'''
+        key = font, text, antialias, tuple(pygame.Color(color))
+        surface = self.get(key)
+        if surface == None:
+            surface = font.render(text, antialias, color)
+            self.set(key, surface)
+        return surface
+
+    def forget_font(self, font):
+        '''TextCache.forget_font(pygame.font.Font) -> None
+        forgets every text rendered in font'''
+        for key in [key for key in self.values if key[0] == font]:
+            self.remove(key)
+
+class FrameStats:
+    '''represents the times of the most recent frames'''
+
+    def __init__(self, maxFrames=600):
+        '''FrameStats(int) -> FrameStats
+        constructs the stats keeping the last maxFrames frame times'''
+        self.times = collections.deque(maxlen=maxFrames)
+
+    def __len__(self):
+        '''len(FrameStats) -> int
+        returns the number of frame times kept'''
+        return len(self.times)
+
+    def add(self, seconds):
+        '''FrameStats.add(float) -> None
+        adds the time of a frame'''
+        self.times.append(seconds)
+
+    def clear(self):
+        '''FrameStats.clear() -> None
+        forgets all frame times'''
+        self.times.clear()
+
+    def get_mean(self):
+        '''FrameStats.get_mean() -> float
+        returns the mean frame time in seconds'''
+        if len(self.times) == 0: return 0
+        return sum(self.times)/len(self.times)
+
+    def get_percentile(self, percent):
+        '''FrameStats.get_percentile(float) -> float
+        returns the frame time that percent of the frames are at or under'''
+        if len(self.times) == 0: return 0
+        times = sorted(self.times)
+        return times[min(len(times)-1, math.ceil(len(times)*percent/100)-1)]
+
+    def get_p95(self):
+        '''FrameStats.get_p95() -> float
+        returns the 95th percentile frame time'''
+        return self.get_percentile(95)
+
+    def get_p99(self):
+        '''FrameStats.get_p99() -> float
+        returns the 99th percentile frame time'''
+        return self.get_percentile(99)
+
+class Profiler:
+    '''represents how long each stage of the recent frames took and how much work they did
+    a stage is timed from Profiler.begin(stage) to Profiler.end(stage), as often as it happens in a frame
+    nothing is measured unless the overlay is shown or samples are streamed to a CSV file'''
+
+    def __init__(self, stages=(), counters=(), maxFrames=600):
+        '''Profiler(tuple, tuple, int) -> Profiler
+        constructs the profiler keeping the samples of the last maxFrames frames'''
+        self.stages = []
+        self.counters = []
+        self.times = {}
+        self.counts = {}
+        self.starts = {}
+        self.samples = collections.deque(maxlen=maxFrames)
+        self.frame = 0
+        self.frameStart = None
+        self.shown = False
+        self.csvFile = None
+        self.csvWriter = None
+        self.add_stages(*stages)
+        self.add_counters(*counters)
+
+    def add_stages(self, *stages):
+        '''Profiler.add_stages(*str) -> None
+        adds stages to time'''
+        stages = [stage for stage in stages if stage not in self.times]
+        if len(stages) > 0 and self.csvFile != None:
+            raise GameSetupError("Cannot add stages while streaming samples.")
+        for stage in stages:
+            self.stages.append(stage)
+            self.times[stage] = 0
+
+    def add_counters(self, *counters):
+        '''Profiler.add_counters(*str) -> None
+        adds counters of work done in a frame'''
+        counters = [counter for counter in counters if counter not in self.counts]
+        if len(counters) > 0 and self.csvFile != None:
+            raise GameSetupError("Cannot add counters while streaming samples.")
+        for counter in counters:
+            self.counters.append(counter)
+            self.counts[counter] = 0
+
+    def get_stages(self):
+        '''Profiler.get_stages() -> list
+        returns the stages in order'''
+        return self.stages[:]
+
+    def get_counters(self):
+        '''Profiler.get_counters() -> list
+        returns the counters in order'''
+        return self.counters[:]
+
+    def is_enabled(self):
+        '''Profiler.is_enabled() -> bool
+        returns if frames are being measured'''
+        return self.shown or self.csvFile != None
+
+    def is_shown(self):
+        '''Profiler.is_shown() -> bool
+        returns if the overlay is shown'''
+        return self.shown
+
+    def show(self, boolean=True):
+        '''Profiler.show(bool) -> None
+        shows or hides the overlay'''
+        self.shown = boolean
+
+    def stream(self, path):
+        '''Profiler.stream(str) -> None
+        writes a row for every frame to the CSV file at path from now on
+        if path is None, stops streaming'''
+        if self.csvFile != None:
+            self.csvFile.close()
+            self.csvFile = self.csvWriter = None
+        if path == None: return
+        self.csvFile = open(path, "w", newline="")
+        self.csvWriter = csv.writer(self.csvFile)
+        self.csvWriter.writerow(["frame", "total_ms"] + [stage+"_ms" for stage in self.stages] + self.counters)
+
+    def close(self):
+        '''Profiler.close() -> None
+        stops streaming samples'''
+        self.stream(None)
+
+    def begin_frame(self):
+        '''Profiler.begin_frame() -> None
+        starts measuring a frame'''
+        self.frameStart = time.perf_counter()
+
+    def end_frame(self):
+        '''Profiler.end_frame() -> None
+        keeps the sample of the frame and streams it'''
+        if self.is_enabled() and self.frameStart != None:
+            sample = [self.frame, time.perf_counter()-self.frameStart] + \
+                [self.times[stage] for stage in self.stages] + [self.counts[counter] for counter in self.counters]
+            self.samples.append(sample)
+            if self.csvWriter != None:
+                self.csvWriter.writerow([sample[0]] + [round(1000*seconds, 3) for seconds in sample[1:len(self.stages)+2]] +
+                    sample[len(self.stages)+2:])
+
+        for stage in self.stages: self.times[stage] = 0
+        for counter in self.counters: self.counts[counter] = 0
+        self.starts.clear()
+        self.frame += 1
+        self.frameStart = None
+
+    def begin(self, stage):
+        '''Profiler.begin(str) -> None
+        starts timing stage'''
+        if self.shown or self.csvFile != None:
+            self.starts[stage] = time.perf_counter()
+
+    def end(self, stage):
+        '''Profiler.end(str) -> None
+        stops timing stage'''
+        start = self.starts.pop(stage, None)
+        if start != None:
+            self.times[stage] += time.perf_counter() - start
+
+    def count(self, counter, num=1):
+        '''Profiler.count(str, int) -> None
+        counts num more of counter in this frame'''
+        if self.shown or self.csvFile != None:
+            self.counts[counter] += num
+
+    def get_samples(self):
+        '''Profiler.get_samples() -> list
+        returns the kept samples as [frame, total seconds, stage seconds..., counts...]'''
+        return list(self.samples)
+
+    def get_mean(self, stage=None):
+        '''Profiler.get_mean(str) -> float
+        returns the mean seconds of stage in the kept samples
+        if stage is None, returns the mean of the whole frame'''
+        if len(self.samples) == 0: return 0
+        index = 1 if stage == None else self.stages.index(stage)+2
+        return sum(sample[index] for sample in self.samples)/len(self.samples)
+
+    def get_max(self, stage=None):
+        '''Profiler.get_max(str) -> float
+        returns the most seconds stage took in the kept samples
+        if stage is None, returns the slowest whole frame'''
+        if len(self.samples) == 0: return 0
+        index = 1 if stage == None else self.stages.index(stage)+2
+        return max(sample[index] for sample in self.samples)
+
+    def get_slowest(self):
+        '''Profiler.get_slowest() -> (int, str)
+        returns the slowest kept frame and the stage that took the longest in it'''
+        if len(self.samples) == 0 or len(self.stages) == 0: return None
+        sample = max(self.samples, key=lambda sample: sample[1])
+        times = sample[2:len(self.stages)+2]
+        return sample[0], self.stages[times.index(max(times))]
+
+    def draw(self, surface, font, pos=(0,0)):
+        '''Profiler.draw(pygame.Surface, pygame.font.Font, (x,y)) -> None
+        draws the overlay of mean and most milliseconds of each stage
+        and the mean counts per frame on surface'''
+        counts = len(self.samples) or 1
+        lines = [f"{'frame':<12}{1000*self.get_mean():7.2f}{1000*self.get_max():7.2f}"]
+        lines += [f"{stage:<12}{1000*self.get_mean(stage):7.2f}{1000*self.get_max(stage):7.2f}" for stage in self.stages]
+        lines += [f"{counter:<12}{sum(sample[len(self.stages)+2+i] for sample in self.samples)/counts:7.1f}"
+            for i, counter in enumerate(self.counters)]
+        slowest = self.get_slowest()
+        if slowest != None: lines.append(f"slowest: {slowest[1]}")
+
+        height = font.get_linesize()
+        images = [font.render(line, True, (255, 255, 255)) for line in lines]
+        overlay = pygame.Surface((max(image.get_width() for image in images)+10, height*len(images)+10), pygame.SRCALPHA)
+        overlay.fill((0, 0, 0, 170))
+        for i in range(len(images)):
+            overlay.blit(images[i], (5, 5+i*height))
+        surface.blit(overlay, pos)
+
+class SpatialHash:
+    '''represents a grid of cells to quickly find items near a point'''
+
+    def __init__(self, cellSize=128):
+        '''SpatialHash(int) -> SpatialHash
+        constructs an empty grid with square cells of cellSize'''
+        self.cellSize = cellSize
+        self.cells = {}
+        self.numItems = 0
+
+    def __len__(self):
+        '''len(SpatialHash) -> int
+        returns the number of items in the grid'''
+        return self.numItems
+
+    def cell(self, pos):
+        '''SpatialHash.cell((x,y)) -> (int, int)
+        returns the cell containing pos'''
+        return int(pos[0]//self.cellSize), int(pos[1]//self.cellSize)
+
+    def add(self, item, pos):
+        '''SpatialHash.add(item, (x,y)) -> None
+        adds item to the grid at pos'''
+        cell = self.cell(pos)
+        if cell not in self.cells:
+            self.cells[cell] = []
+        self.cells[cell].append(item)
+        self.numItems += 1
+
+    def remove(self, item, pos):
+        '''SpatialHash.remove(item, (x,y)) -> bool
+        removes item added at pos and returns if it was found'''
+        cell = self.cell(pos)
+        if cell not in self.cells or item not in self.cells[cell]:
+            return False
+
+        self.cells[cell].remove(item)
+        if len(self.cells[cell]) == 0:
+            self.cells.pop(cell)
+        self.numItems -= 1
+        return True
+
+    def clear(self):
+        '''SpatialHash.clear() -> None
+        removes all items from the grid'''
+        self.cells.clear()
+        self.numItems = 0
+
+    def query_rect(self, rect):
+        '''SpatialHash.query_rect(rect) -> list
+        returns the items in the cells touching rect'''
+        left, top = self.cell(rect[:2])
+        right, bottom = self.cell((rect[0]+rect[2], rect[1]+rect[3]))
+        items = []
+        for x in range(left, right+1):
+            for y in range(top, bottom+1):
+                if (x,y) in self.cells:
+                    items.extend(self.cells[(x,y)])
+        return items
+
+    def query(self, pos, radius):
+        '''SpatialHash.query((x,y), float) -> list
+        returns the items in the cells within radius of pos'''
+        return self.query_rect((pos[0]-radius, pos[1]-radius, 2*radius, 2*radius))
+
+class KDTree:
+    '''represents points split in half across x and y in turn, to quickly find the points near a point'''
+
+    def __init__(self, points, items=None, leafSize=8):
+        '''KDTree(list, list, int) -> KDTree
+        constructs the tree with an item for each point
+        if items not given, the items are the indices of the points'''
+        if items == None: items = range(len(points))
+        self.numItems = len(points)
+        self.leafSize = leafSize
+        self.root = self.build([(point[0], point[1], item) for point, item in zip(points, items)], 0)
+
+    def __len__(self):
+        '''len(KDTree) -> int
+        returns the number of points in the tree'''
+        return self.numItems
+
+    def build(self, entries, axis):
+        '''KDTree.build(list, int) -> node
+        returns a leaf list of entries, or (axis, split, left, right) splitting them in half'''
+        if len(entries) <= self.leafSize: return entries
+        entries.sort(key=lambda entry: entry[axis])
+        middle = len(entries)//2
+        return axis, entries[middle][axis], self.build(entries[:middle], 1-axis), self.build(entries[middle:], 1-axis)
+
+    def query(self, pos, radius):
+        '''KDTree.query((x,y), float) -> list
+        returns the items of the points less than radius from pos'''
+        found = []
+        nodes = [self.root]
+        while len(nodes) > 0:
+            node = nodes.pop()
+            if isinstance(node, list):
+                for x, y, item in node:
+                    if (x-pos[0])**2 + (y-pos[1])**2 < radius**2:
+                        found.append(item)
+            else:
+                axis, split, left, right = node
+                if pos[axis]-radius < split: nodes.append(left)
+                if pos[axis]+radius > split: nodes.append(right)
+        return found
+
+class WorkerPool:
+    '''represents threads or processes that run a function over chunks of a list
+    with no workers, the function runs in the calling thread'''
+
+    def __init__(self, workers=0, processes=False):
+        '''WorkerPool(int, bool) -> WorkerPool
+        constructs the pool with workers threads, or processes if processes
+        the workers are started on first use'''
+        self.workers = workers
+        self.processes = processes
+        self.executor = None
+
+    def get_workers(self):
+        '''WorkerPool.get_workers() -> int
+        returns the number of workers'''
+        return self.workers
+
+    def uses_processes(self):
+        '''WorkerPool.uses_processes() -> bool
+        returns if the workers are processes'''
+        return self.processes
+
+    def map(self, function, items, *args):
+        '''WorkerPool.map(function, list, *args) -> list
+        returns the results of function(chunk, *args) for chunks of items, joined in order
+        function must return a list with a result for each item in its chunk
+        with processes, function and args must be picklable'''
+        if self.workers == 0 or len(items) < 2:
+            return function(items, *args)
+        if self.executor == None:
+            if self.processes: self.executor = concurrent.futures.ProcessPoolExecutor(self.workers)
+            else: self.executor = concurrent.futures.ThreadPoolExecutor(self.workers)
+
+        size = math.ceil(len(items)/self.workers)
+        futures = [self.executor.submit(function, items[i:i+size], *args) for i in range(0, len(items), size)]
+        results = []
+        for future in futures:
+            results.extend(future.result())
+        return results
+
+    def close(self):
+        '''WorkerPool.close() -> None
+        stops the workers, which are started again if the pool is used'''
+        if self.executor != None:
+            self.executor.shutdown()
+            self.executor = None
+
+class OrientedRects:
+    '''represents rects turned by angles, for testing many points against them at once
+    a point is in a rect if it is less than size[1]/2 from the center along the angle
+    and less than size[0]/2 from it across the angle'''
+
+    def __init__(self, centers, sizes, angles):
+        '''OrientedRects(list, list, list) -> OrientedRects
+        constructs the rects, with angles in degrees
+        sizes can be a single size for every rect'''
+        if len(sizes) == 2 and not isinstance(sizes[0], (tuple, list)):
+            sizes = [sizes]*len(centers)
+
+        # the rotations are worked out once for every test
+        if numpy != None:
+            self.centers = numpy.array(centers, float).reshape(-1, 2)
+            self.halves = numpy.array(sizes, float).reshape(-1, 2)/2
+            angles = numpy.radians(numpy.array(angles, float))
+            self.cos, self.sin = numpy.cos(angles), numpy.sin(angles)
+        else:
+            self.centers = [tuple(center) for center in centers]
+            self.halves = [(size[0]/2, size[1]/2) for size in sizes]
+            self.cos = [math.cos(math.radians(angle)) for angle in angles]
+            self.sin = [math.sin(math.radians(angle)) for angle in angles]
+
+    def __len__(self):
+        '''len(OrientedRects) -> int
+        returns the number of rects'''
+        return len(self.centers)
+
+    def contains(self, points, rects=None, pad=0):
+        '''OrientedRects.contains(list, list, float) -> matrix
+        returns if each point is in each rect, or each rect at the indices in rects
+        pad is added to the size of the rects, and can be a list with a pad for each point'''
+        if rects == None: rects = range(len(self))
+        if numpy != None:
+            rects = numpy.array(rects, int)
+            points = numpy.array(points, float).reshape(-1, 2)
+            pad = numpy.reshape(numpy.array(pad, float)/2, (-1, 1))
+            dx = points[:, :1] - self.centers[rects, 0]
+            dy = points[:, 1:] - self.centers[rects, 1]
+            along = dx*self.cos[rects] - dy*self.sin[rects]
+            across = dx*self.sin[rects] + dy*self.cos[rects]
+            return (numpy.abs(along) < self.halves[rects, 1]+pad) & (numpy.abs(across) < self.halves[rects, 0]+pad)
+
+        if not isinstance(pad, (tuple, list)): pad = [pad]*len(points)
+        return [[self.point_in(point, rect, pad[i]) for rect in rects] for i, point in enumerate(points)]
+
+    def contains_pairs(self, points, rects, pad=0):
+        '''OrientedRects.contains_pairs(list, list, float) -> list
+        returns if each point is in the rect at the same place in rects
+        pad is added to the size of the rects, and can be a list with a pad for each point'''
+        if numpy != None:
+            rects = numpy.array(rects, int)
+            points = numpy.array(points, float).reshape(-1, 2)
+            pad = numpy.array(pad, float)/2
+            dx = points[:, 0] - self.centers[rects, 0]
+            dy = points[:, 1] - self.centers[rects, 1]
+            along = dx*self.cos[rects] - dy*self.sin[rects]
+            across = dx*self.sin[rects] + dy*self.cos[rects]
+            return ((numpy.abs(along) < self.halves[rects, 1]+pad) & (numpy.abs(across) < self.halves[rects, 0]+pad)).tolist()
+
+        if not isinstance(pad, (tuple, list)): pad = [pad]*len(points)
+        return [self.point_in(points[i], rects[i], pad[i]) for i in range(len(points))]
+
+    def hits(self, points, rects=None, pad=0):
+        '''OrientedRects.hits(list, list, float) -> list
+        returns (point index, rect index) for every point in a rect'''
+        if rects == None: rects = range(len(self))
+        matrix = self.contains(points, rects, pad)
+        if numpy != None:
+            return [(int(i), rects[j]) for i, j in zip(*numpy.nonzero(matrix))]
+        return [(i, rects[j]) for i in range(len(matrix)) for j in range(len(matrix[i])) if matrix[i][j]]
+
+    def point_in(self, point, rect, pad=0):
+        '''OrientedRects.point_in((x,y), int, float) -> bool
+        returns if point is in the rect at index rect'''
+        dx, dy = point[0]-self.centers[rect][0], point[1]-self.centers[rect][1]
+        cos, sin, halves = self.cos[rect], self.sin[rect], self.halves[rect]
+        return abs(dx*cos - dy*sin) < halves[1]+pad/2 and abs(dx*sin + dy*cos) < halves[0]+pad/2
+
+class RotationAtlas:
+    '''represents a store of rotated surfaces to share between sprites
+    angles are rounded to the nearest step'''
+
+    def __init__(self, step=2, maxFrames=1024):
+        '''RotationAtlas(float, int) -> RotationAtlas
+        constructs an atlas keeping at most maxFrames rotations'''
+        self.step = step
+        self.numFrames = round(360/step)
+        self.frames = Cache(maxFrames)
+
+    def get_step(self):
+        '''RotationAtlas.get_step() -> float
+        returns the angle between two rotations'''
+        return self.step
+
+    def get_cache(self):
+        '''RotationAtlas.get_cache() -> Cache
+        returns the cache holding the rotations'''
+        return self.frames
+
+    def rotate(self, surface, angle, profiler=None):
+        '''RotationAtlas.rotate(Surface, float, Profiler) -> Surface
+        returns surface rotated by angle rounded to the step
+        rotations that aren't in the atlas yet are counted as rotozooms on profiler'''
+        index = round(angle/self.step) % self.numFrames
+        frame = self.frames.get((surface, index))
+        if frame == None:
+            frame = pygame.transform.rotozoom(surface, index*self.step, 1)
+            self.frames.set((surface, index), frame)
+            if profiler != None: profiler.count("rotozoom")
+        return frame
+
+    def prebake(self, surface):
+        '''RotationAtlas.prebake(Surface) -> None
+        computes every rotation of surface ahead of time'''
+        for index in range(self.numFrames):
+            self.rotate(surface, index*self.step)
 
 class Camera(pygame.Surface):
     '''Camera inherits from Surface
@@ -109,6 +758,16 @@ class Camera(pygame.Surface):
         sets the view (top-left corner) of the camera'''
         self.view = point
 
+    def get_view_rect(self):
+        '''Camera.get_view_rect() -> pygame.Rect
+        returns the rect of the world that is in view'''
+        return pygame.Rect(self.view, self.get_size())
+
+    def is_visible(self, rect):
+        '''Camera.is_visible(rect) -> bool
+        returns if rect (relative to world) is in view'''
+        return self.get_view_rect().colliderect(rect)
+
     def get_at(self, point):
         '''Camera.get_at((x,y)) -> color
         returns the color at point'''
@@ -124,13 +783,23 @@ class Camera(pygame.Surface):
         draws one image onto another'''
         return pygame.Surface.blit(self, source, self.point(dest), area, special_flags)
 
+    def backdrop(self, source, special_flags=0):
+        '''Camera.backdrop(Surface) -> Rect
+        draws the part of source (a surface the size of the world) that is in view'''
+        return pygame.Surface.blit(self, source, (0,0), self.get_view_rect(), special_flags)
+
     ### METHODS TO DRAW SHAPES WITH ###
 
     def line(self, color, start_pos, end_pos, width=1):
         '''Camera.draw_line(Color, (x,y), (x,y), int) -> Rect
         draws a line from pygame.draw'''
         pygame.draw.line(self, color, self.point(start_pos), self.point(end_pos), width)
-        
+
+    def circle(self, color, center, radius, width=0):
+        '''Camera.circle(Color, (x,y), int, int) -> Rect
+        draws a circle from pygame.draw'''
+        return pygame.draw.circle(self, color, self.point(center), radius, width)
+
 class Sprite(pygame.sprite.Sprite):
     '''sprite object to inherit from'''
 
@@ -144,12 +813,15 @@ class Sprite(pygame.sprite.Sprite):
         self.position = (0,0)
         self.head = 0
         self.game = game
-        self.slideClock = Clock()
+        self.slideClock = Clock(game=game)
         self.slideDistance = 0
         self.sliding = False
         self.rect = self.image.get_rect()
         self.imageTurning = True
         self.onsurface = onsurface
+        self.atlas = None
+        self.tiltAngle = 0
+        self.lastPosition = None
 
     def get_rect(self):
         '''Sprite.get_rect() -> pygame.Rect
@@ -164,6 +836,13 @@ class Sprite(pygame.sprite.Sprite):
         else:
             self.imageTurning = not self.imageTurning
 
+    def set_atlas(self, atlas):
+        '''Sprite.set_atlas(RotationAtlas) -> None
+        makes the sprite get its rotations from atlas
+        if atlas is None, rotations are computed on every heading change'''
+        self.atlas = atlas
+        self.tilt(self.tiltAngle)
+
     def surface(self, surface=None):
         '''Sprite.surface(surface) -> Surface
         sets the new image of the sprite and heading is set to 0
@@ -175,6 +854,7 @@ class Sprite(pygame.sprite.Sprite):
         self.untiltedImg = surface
         self.tiltedImg = surface
         self.image = surface
+        self.tiltAngle = 0
 
     def heading(self, heading=None):
         '''Sprite.get_heading(heading) -> int
@@ -182,8 +862,11 @@ class Sprite(pygame.sprite.Sprite):
         otherwise sets heading'''
         if heading == None:
             return math.degrees(self.head)
-        if self.imageTurning:
+        if self.imageTurning and self.atlas != None:
+            self.image = self.atlas.rotate(self.untiltedImg, self.tiltAngle+heading, self.game.get_profiler())
+        elif self.imageTurning:
             self.image = pygame.transform.rotozoom(self.tiltedImg, heading, 1)
+            self.game.get_profiler().count("rotozoom")
         self.head = math.radians(heading)
         self.rect = self.image.get_rect()
         self.pos(self.pos())
@@ -192,33 +875,22 @@ class Sprite(pygame.sprite.Sprite):
     def tilt(self, heading):
         '''Sprite.tilt(heading) -> None
         tilts the image so that heading for image is 0 for sprite'''
-        self.tiltedImg = pygame.transform.rotozoom(self.untiltedImg, heading, 1)
+        self.tiltAngle = heading
+        if self.atlas == None:
+            self.tiltedImg = pygame.transform.rotozoom(self.untiltedImg, heading, 1)
+            self.game.get_profiler().count("rotozoom")
         self.heading(self.heading())
 
     def towards(self, pos):
         '''Sprite.towards(pos) -> float
         returns the heading towards pos'''
-        if pos == self.pos(): return self.heading()
-        x, y = pos[0]-self.pos()[0], self.pos()[1]-pos[1]
-
-        # cases
-        if x == 0:
-            if y >= 0: return 90
-            else: return 270
-                
-        elif y == 0:
-            if x >= 0: return 0
-            else: return 180
-
-        heading = math.degrees(math.atan(y/x))
-        if (x < 0 and y > 0) or (x < 0 and y < 0):
-            heading += 180
-        return heading
+        return towards(self.pos(), pos, self.heading())
 
     def distance(self, pos):
         '''Sprite.distance((x,y)) -> float
         returns the distance from pos to sprite'''
-        return math.sqrt((self.xcor() - pos[0])**2 + (self.ycor() - pos[1])**2)
+        x, y = self.pos()
+        return math.sqrt((x - pos[0])**2 + (y - pos[1])**2)
 
     def in_dir(self, heading, distance, rel=True):
         '''Sprite.in_dir(int, int, bool) -> (x,y)
@@ -252,7 +924,8 @@ class Sprite(pygame.sprite.Sprite):
         returns the position of the object if pos not given
         otherwise sets pos'''
         if pos == None:
-            return round(self.position[0]), round(self.position[1])
+            x, y = self.position
+            return round(x), round(y)
 
         self.rect = pygame.Rect(pos[0]-self.rect.width/2, pos[1]-self.rect.height/2,
             self.rect.width, self.rect.height)
@@ -304,13 +977,38 @@ class Sprite(pygame.sprite.Sprite):
     def update(self):
         '''Sprite.update() -> None
         keeps updating the sprite'''
-        # update if moving with time
+        self.slide()
+        self.draw()
+
+    def slide(self):
+        '''Sprite.slide() -> None
+        moves the sprite if it is moving with time'''
         if self.sliding:
             distance = self.slideDistance*self.slideClock.get_time()/self.slideClock.get_max()
             self.position = (self.slideStart[0]+distance*math.cos(math.radians(self.heading())),
                 self.slideStart[1]-distance*math.sin(math.radians(self.heading())))
-            
-        self.game.blit(self.image, self.position, True, True, self.onsurface)
+
+    def save_position(self):
+        '''Sprite.save_position() -> None
+        saves the position so the sprite can be drawn between it and the next one'''
+        self.lastPosition = self.position
+
+    def draw_pos(self, alpha=1):
+        '''Sprite.draw_pos(float) -> (x,y)
+        returns the point alpha of the way from the saved position to the position'''
+        if self.lastPosition == None or alpha == 1:
+            return self.position
+        return self.lastPosition[0] + alpha*(self.position[0]-self.lastPosition[0]), \
+            self.lastPosition[1] + alpha*(self.position[1]-self.lastPosition[1])
+
+    def draw(self, alpha=1):
+        '''Sprite.draw(float) -> None
+        blits the sprite on its surface at Sprite.draw_pos(alpha)
+        sprites outside of a camera's view are skipped'''
+        pos = self.draw_pos(alpha)
+        if isinstance(self.onsurface, Camera) and not self.onsurface.is_visible(self.image.get_rect(center=pos)):
+            return
+        self.game.blit(self.image, pos, True, True, self.onsurface)
 
     def stop_time(self):
         '''Sprite.stop_time() -> None
@@ -877,28 +1575,6 @@ class Popup(Widget):
         for button in self.buttons:
             button.update()
 
-class _AfterEvent:
-    '''private class for after events'''
-
-    def __init__(self, game, eventList, ms, command):
-        '''_AfterEvent(Game, eventList, ms, command) -> _AfterEvent
-        constructs the event object for after'''
-        self.ms = ms
-        self.command = command
-        self.clock = Clock(game=game)
-        self.clock.start()
-        self.eventList = eventList
-        self.eventList.append(self)
-        self.completed = False
-
-    def check(self):
-        '''_AfterEvent.check() -> None
-        checks if the event is ready'''
-        if self.clock.get_time() > self.ms/1000 and not self.completed:
-            self.command()
-            self.eventList.remove(self)
-            self.completed = True
-
 class Sound(pygame.mixer.Sound):
     '''represents a sound object to be played, muted, unmuted'''
 
@@ -931,21 +1607,50 @@ class Game:
     intended to be inherited from. includes methods like after
     you must include an update method and your display
     you must call Game.mainloop() to start your game
-    your Game.update() method will be called every iteration of mainloop'''
+    your Game.update() method will be called every iteration of mainloop
+    a headless game has no display: events are not checked and blits are skipped
 
-    def __init__(self):
-        '''Game() -> Game
+    with Game.set_timestep(seconds), Game.tick() is called every timestep instead
+    and Game.render(alpha) is called every iteration of mainloop, where alpha is
+    how far it is between the last tick and the next one
+
+    a headless game with a timestep moves its timebase forward a timestep every tick,
+    so its clocks and afters don't depend on how fast it runs
+    (set the timestep before starting any clocks)
+
+    with Game.set_fps(fps), mainloop sleeps so it runs at most fps times a second
+    while Game.is_idle() returns True, mainloop waits for events instead of running'''
+
+    def __init__(self, headless=False):
+        '''Game(bool) -> Game
         constructs the game'''
+        self.headless = headless
         self.restarting = False
         self.isGameRunning = True
-        self._AfterEvents = []
         self.soundsList = []
         self.isGameMuted = False
         self.screen = None
         self.widgets = {}
         self.gameFocusedWidget = None
         self.bindings = {}
-        self.gameClocks = []
+        self.gameClocks = weakref.WeakSet()
+        self.timebase = Timebase()
+        self.timestep = None
+        self.maxTicks = 5
+        self.accumulator = 0
+        self.lastFrame = None
+        self.fps = None
+        self.nextFrame = None
+        self.idleTimeout = 100
+        self.frameStats = FrameStats()
+        self.profiler = Profiler(("afters",), ("rotozoom",))
+
+        # afters are kept in a heap of [due time, ID, command] on one game clock
+        self.afterQueue = []
+        self.afterIDs = {}
+        self.afterCount = itertools.count()
+        self.afterClock = Clock(game=self)
+        self.afterClock.start()
 
     def focus(self, focus=None):
         '''Game.focus(focus=None) -> type
@@ -961,6 +1666,59 @@ class Game:
 
         self.gameFocusedWidget = focus
 
+    def is_headless(self):
+        '''Game.is_headless() -> bool
+        returns if the game runs without a display'''
+        return self.headless
+
+    def get_timestep(self):
+        '''Game.get_timestep() -> float
+        returns the seconds between ticks, or None if there is no fixed timestep'''
+        return self.timestep
+
+    def set_timestep(self, timestep, maxTicks=5):
+        '''Game.set_timestep(float, int) -> None
+        makes the game tick every timestep seconds
+        if a frame takes longer than maxTicks timesteps, the extra time is dropped'''
+        self.timestep = timestep
+        self.maxTicks = maxTicks
+        self.accumulator = 0
+        self.lastFrame = None
+        self.timebase.set_manual(self.headless and timestep != None)
+
+    def get_timebase(self):
+        '''Game.get_timebase() -> Timebase
+        returns the timebase registered clocks read from'''
+        return self.timebase
+
+    def get_fps(self):
+        '''Game.get_fps() -> float
+        returns the target frame rate, or None if there isn't one'''
+        return self.fps
+
+    def set_fps(self, fps):
+        '''Game.set_fps(float) -> None
+        sets the most frames per second mainloop runs at
+        if fps is None, mainloop runs as fast as it can'''
+        self.fps = fps
+        self.nextFrame = None
+
+    def get_frame_stats(self):
+        '''Game.get_frame_stats() -> FrameStats
+        returns the stats of how long the recent frames took to run'''
+        return self.frameStats
+
+    def get_profiler(self):
+        '''Game.get_profiler() -> Profiler
+        returns the profiler of the stages of each frame'''
+        return self.profiler
+
+    def is_idle(self):
+        '''Game.is_idle() -> bool
+        returns if nothing changes until an event comes
+        This method is meant to be overridden'''
+        return False
+
     def get_screen(self):
         '''Game.get_screen() -> type
         returns the game screen'''
@@ -989,9 +1747,32 @@ class Game:
         self.widgets[widgetID] = widget
 
     def after(self, ms, command):
-        '''Game.after(ms, command) -> time
-        performs command after ms milliseconds'''
-        self._AfterEvents.append(_AfterEvent(self, self._AfterEvents, ms, command))
+        '''Game.after(ms, command) -> ID
+        performs command after ms milliseconds of game time
+        returns an ID that can be given to Game.after_cancel'''
+        ID = next(self.afterCount)
+        after = [self.afterClock.get_time()+ms/1000, ID, command]
+        heapq.heappush(self.afterQueue, after)
+        self.afterIDs[ID] = after
+        return ID
+
+    def after_cancel(self, ID):
+        '''Game.after_cancel(ID) -> None
+        cancels the after connected to ID'''
+        if ID in self.afterIDs:
+            # the after is left in the heap and skipped when it is due
+            self.afterIDs.pop(ID)[2] = None
+
+    def run_afters(self):
+        '''Game.run_afters() -> None
+        performs the afters that are due
+        afters made while running wait for the next call'''
+        now = self.afterClock.get_time()
+        while len(self.afterQueue) > 0 and self.afterQueue[0][0] < now:
+            due, ID, command = heapq.heappop(self.afterQueue)
+            if command != None:
+                self.afterIDs.pop(ID)
+                command()
 
     def sound(self, file, volume=1):
         '''Game.sound(file, volume=1) -> Sound
@@ -1017,18 +1798,21 @@ class Game:
     
     def register_clock(self, clock):
         '''Game.register_clock(Clock) -> None
-        registers a clock for the main pause'''
-        self.gameClocks.append(clock)
+        registers a clock for the main pause
+        the clock reads the game's timebase, so register it before starting it'''
+        clock.game = self
+        clock.timebase = self.timebase
+        self.gameClocks.add(clock)
 
     def pause_all_clocks(self):
         '''Game.pause_all_clocks() -> None
-        pauses all registered clocks'''
-        for clock in self.gameClocks: clock.stop()
+        pauses all registered clocks by pausing the timebase'''
+        self.timebase.pause()
 
     def play_all_clocks(self):
         '''Game.play_all_clocks() -> None
-        plays all registered clocks'''
-        for clock in self.gameClocks: clock.start()
+        plays all registered clocks by playing the timebase'''
+        self.timebase.play()
         
     def restart(self):
         '''Game.restart() -> None
@@ -1048,6 +1832,17 @@ class Game:
         don't forget to update your display!'''
         pass
 
+    def tick(self):
+        '''Game.tick() -> None
+        place holder for a fixed timestep update. This method is meant to be overridden'''
+        pass
+
+    def render(self, alpha=1):
+        '''Game.render(float) -> None
+        place holder for drawing between ticks. This method is meant to be overridden
+        alpha is how far it is from the last tick to the next one'''
+        pass
+
     def event(self, event):
         '''Game.event(event) -> None
         checks up an event. This method is meant to be overridden'''
@@ -1056,6 +1851,7 @@ class Game:
     def blit(self, surface, pos, centerx=False, centery=False, onsurface=None):
         '''Game.blit(surface, pos, centerx=False, centery=False, onsurface=None) -> None
         blits surface on onsurface at pos'''
+        if self.headless: return
         if onsurface == None:
             onsurface = self.screen
             
@@ -1098,11 +1894,61 @@ class Game:
         '''Game.mainloop() -> None
         starts the mainloop for the game'''
         while self.isGameRunning:
-            # check all after events
-            for event in self._AfterEvents[:]:
-                event.check()
+            if self.is_idle() and not self.headless:
+                self.wait()
+            start = time.perf_counter()
+            self.step()
+            self.frameStats.add(time.perf_counter()-start)
+            self.pace()
 
-            # other events
+        # quit or restart
+        self.profiler.close()
+        pygame.quit()
+        if self.restarting:
+            pygame.init()
+            self.__init__()
+
+    def wait(self):
+        '''Game.wait() -> None
+        sleeps until an event comes, idleTimeout milliseconds pass or an after is due
+        afters can't come due while the timebase is paused'''
+        timeout = self.idleTimeout
+        if len(self.afterQueue) > 0 and not self.timebase.is_paused():
+            timeout = min(timeout, max(0, int(1000*(self.afterQueue[0][0]-self.afterClock.get_time())))+1)
+        event = pygame.event.wait(timeout)
+        if event.type != pygame.NOEVENT:
+            pygame.event.post(event)
+
+        # the time waiting isn't ticked
+        self.lastFrame = None
+        self.nextFrame = None
+
+    def pace(self):
+        '''Game.pace() -> None
+        sleeps until it is time for the next frame'''
+        if self.fps == None or self.headless: return
+        now = time.perf_counter()
+        if self.nextFrame == None or now - self.nextFrame > 1/self.fps:
+            # too far behind, so start pacing from now
+            self.nextFrame = now
+        self.nextFrame += 1/self.fps
+
+        # sleep the whole wait instead of spinning, since a little jitter is
+        # cheaper than a busy core, and frames are paced from nextFrame so it doesn't add up
+        if self.nextFrame > now:
+            time.sleep(self.nextFrame - now)
+
+    def step(self):
+        '''Game.step() -> None
+        runs a single iteration of the mainloop
+        headless games can call this directly as fast as they like'''
+        self.profiler.begin_frame()
+        self.profiler.begin("afters")
+        self.run_afters()
+        self.profiler.end("afters")
+
+        # other events
+        if not self.headless:
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     self.close()
@@ -1121,25 +1967,107 @@ class Game:
                     
                 self.event(event)
 
+        if self.timestep == None:
             self.update()
-
-        # quit or restart
-        pygame.quit()
-        if self.restarting:
-            pygame.init()
-            self.__init__()
+        elif self.headless:
+            self.timebase.advance(self.timestep)
+            self.tick()
+        else:
+            self.run_ticks()
+        self.profiler.end_frame()
+
+    def run_ticks(self):
+        '''Game.run_ticks() -> None
+        ticks once for each timestep since the last frame, then renders'''
+        now = time.perf_counter()
+        if self.lastFrame != None:
+            self.accumulator += now - self.lastFrame
+        self.lastFrame = now
+
+        ticks = 0
+        while self.accumulator >= self.timestep and ticks < self.maxTicks:
+            self.tick()
+            self.accumulator -= self.timestep
+            ticks += 1
+        if ticks == self.maxTicks:
+            # too far behind to catch up, so slow down instead
+            self.accumulator = min(self.accumulator, self.timestep)
+
+        self.render(self.accumulator/self.timestep)
 
 def distance(p1, p2):
     '''distance((x,y), (x,y)) -> float
     returns the distance between p1 and p2'''
     return math.sqrt((p1[0]-p2[0])**2 + (p1[1]-p2[1])**2)
 
+def towards(start, pos, heading=0):
+    '''towards((x,y), (x,y), float) -> float
+    returns the heading from start towards pos
+    if they are the same point, returns heading'''
+    if pos == start: return heading
+    x, y = pos[0]-start[0], start[1]-pos[1]
+
+    # cases
+    if x == 0:
+        if y >= 0: return 90
+        else: return 270
+            
+    elif y == 0:
+        if x >= 0: return 0
+        else: return 180
+
+    heading = math.degrees(math.atan(y/x))
+    if (x < 0 and y > 0) or (x < 0 and y < 0):
+        heading += 180
+    return heading
+
+def load_image(file):
+    '''load_image(file) -> pygame.Surface
+    loads an image with per pixel alpha
+    the image is only converted to the display format if there is a display'''
+    surface = pygame.image.load(file)
+    if pygame.display.get_init() and pygame.display.get_surface() != None:
+        return surface.convert_alpha()
+    if surface.get_flags() & pygame.SRCALPHA:
+        return surface
+
+    converted = pygame.Surface(surface.get_size(), pygame.SRCALPHA)
+    converted.blit(surface, (0,0))
+    return converted
+
+def has_pixel_arrays(surface):
+    '''has_pixel_arrays(pygame.Surface) -> bool
+    returns if the pixels of surface can be changed with numpy arrays'''
+    return numpy != None and surface.get_bitsize() == 32 and \
+        surface.get_flags() & pygame.SRCALPHA != 0
+
+def color_mask(surface, color, matchAlpha=True):
+    '''color_mask(pygame.Surface, color, bool) -> numpy.ndarray
+    returns an array of bools for the pixels of surface that are color
+    if not matchAlpha, the alpha of the pixels is ignored'''
+    color = pygame.Color(color)
+    mask = (pygame.surfarray.pixels3d(surface) == (color.r, color.g, color.b)).all(axis=2)
+    if matchAlpha:
+        mask &= pygame.surfarray.pixels_alpha(surface) == color.a
+    return mask
+
+def fill_mask(surface, mask, color):
+    '''fill_mask(pygame.Surface, numpy.ndarray, color) -> None
+    sets the pixels of surface in mask to color'''
+    color = pygame.Color(color)
+    pygame.surfarray.pixels3d(surface)[mask] = color.r, color.g, color.b
+    pygame.surfarray.pixels_alpha(surface)[mask] = color.a
+
 def remove_bg(surface):
     '''remove_bg(pygame.Surface) -> pygame.Surface
     removes the background from surface and returns it'''
     if isinstance(surface, str): surface = pygame.image.load(surface)
     surface = surface.convert_alpha()
     color = surface.get_at((0,0))
+    if has_pixel_arrays(surface):
+        fill_mask(surface, color_mask(surface, color), (0,0,0,0))
+        return surface
+    
     rect = surface.get_rect()
     for x in range(rect[2]):
         for y in range(rect[3]):
@@ -1152,6 +2080,17 @@ def change_colors(surface, *colors):
     changes the colors in surface and returns the result'''
     if isinstance(surface, str): surface = pygame.image.load(surface)
     surface = surface.convert_alpha()
+    if has_pixel_arrays(surface):
+        # a pixel only changes for the first time its color is listed
+        masks, done = [], numpy.zeros(surface.get_size(), bool)
+        for i in range(len(colors)):
+            mask = color_mask(surface, colors[i]) & ~done
+            done |= mask
+            if i % 2 == 0 and i+1 < len(colors): masks.append((mask, colors[i+1]))
+        for mask, color in masks:
+            fill_mask(surface, mask, color)
+        return surface
+    
     rect = surface.get_rect()
     for x in range(rect[2]):
         for y in range(rect[3]):